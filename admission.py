@@ -0,0 +1,130 @@
+import asyncio
+from collections import OrderedDict
+from config import (logger, ADMISSION_GLOBAL_LIMIT, ADMISSION_CHAT_LIMIT, ADMISSION_QUEUE_MAX,
+                    ADMISSION_WAIT_TIMEOUT, ADMISSION_CACHE_MAX)
+from metrics import registro
+from utils import enviar_resposta, criar_menu_voltar, resposta_em_curso
+
+MENSAGEM_OCUPADO = "⏳ Muitas solicitações no momento. Tente novamente em alguns instantes."
+
+# Comandos e botões só de consulta: sob sobrecarga podem receber a última resposta
+# guardada. Os que alteram estado (cep, droneperfil, alertas, start...) recebem
+# sempre o aviso de ocupado, pois a ação pedida não foi executada
+CONSULTAS = frozenset({
+    'clima', 'clima_atual', 'chuva', 'chance_chuva', 'diasdechuva', 'proximos_dias',
+    'drone', 'status_drone', 'baixarlona', 'baixar_lona', 'status_lona', 'relatorio', 'help'
+})
+
+class ControleAdmissao:
+    """
+    Limita os handlers em execução no bot e por chat, com fila de espera
+    limitada. Comandos repetidos de um chat enquanto o anterior ainda roda
+    são descartados; sob sobrecarga o chat recebe na hora a última resposta
+    daquele comando de consulta (se houver) ou um aviso de "ocupado".
+    """
+    def __init__(self, limite_global=ADMISSION_GLOBAL_LIMIT, limite_chat=ADMISSION_CHAT_LIMIT,
+                 fila_max=ADMISSION_QUEUE_MAX, espera_max=ADMISSION_WAIT_TIMEOUT,
+                 respostas_max=ADMISSION_CACHE_MAX, consultas=CONSULTAS):
+        self.semaforo = asyncio.Semaphore(limite_global)
+        self.limite_chat = limite_chat
+        self.fila_max = fila_max
+        self.espera_max = espera_max
+        self.respostas_max = respostas_max
+        self.consultas = consultas
+        self.em_execucao = {}  # chat_id -> nomes dos handlers em execução
+        self.aguardando = 0
+        self.executando = 0
+        self.respostas = OrderedDict()  # (chat_id, nome) -> (mensagem, reply_markup)
+        self.resultados = {}
+
+    def _contar(self, resultado):
+        self.resultados[resultado] = self.resultados.get(resultado, 0) + 1
+
+    def guardar_resposta(self, chave, mensagem, reply_markup):
+        """Guarda a última resposta bem-sucedida de (chat, comando)"""
+        if mensagem.startswith('❌'):
+            return
+        self.respostas[chave] = (mensagem, reply_markup)
+        self.respostas.move_to_end(chave)
+        while len(self.respostas) > self.respostas_max:
+            self.respostas.popitem(last=False)
+
+    async def _recusar(self, update, chat_id, nome, motivo):
+        """
+        Resposta rápida sob sobrecarga: a última resposta do comando de
+        consulta ou o aviso de ocupado
+        """
+        self._contar(motivo)
+        logger.warning(f"Handler {nome} recusado para {chat_id} ({motivo})")
+        anterior = self.respostas.get((chat_id, nome)) if nome in self.consultas else None
+        if anterior is not None:
+            mensagem, reply_markup = anterior
+            await enviar_resposta(update, f"{mensagem}\n_⏳ Resposta anterior: bot ocupado no momento_", reply_markup)
+        else:
+            await enviar_resposta(update, MENSAGEM_OCUPADO, criar_menu_voltar())
+
+    async def executar(self, chat_id, nome, handler, update, context):
+        """Executa o handler se houver vaga; retorna False se foi recusado ou descartado"""
+        ativos = self.em_execucao.get(chat_id, set())
+        if nome in ativos:
+            # O mesmo comando já está em execução para o chat: ele responderá
+            self._contar('duplicado')
+            return False
+        if len(ativos) >= self.limite_chat:
+            await self._recusar(update, chat_id, nome, 'limite_chat')
+            return False
+        ocupado = self.semaforo.locked()
+        if ocupado and self.aguardando >= self.fila_max:
+            await self._recusar(update, chat_id, nome, 'fila_cheia')
+            return False
+
+        ativos = self.em_execucao.setdefault(chat_id, set())
+        ativos.add(nome)
+        try:
+            if ocupado:
+                self.aguardando += 1
+                try:
+                    await asyncio.wait_for(self.semaforo.acquire(), self.espera_max)
+                except asyncio.TimeoutError:
+                    await self._recusar(update, chat_id, nome, 'espera_esgotada')
+                    return False
+                finally:
+                    self.aguardando -= 1
+            else:
+                await self.semaforo.acquire()
+
+            self._contar('admitido')
+            self.executando += 1
+            guardar = None
+            if nome in self.consultas:
+                guardar = lambda mensagem, markup: self.guardar_resposta((chat_id, nome), mensagem, markup)
+            marca = resposta_em_curso.set(guardar)
+            try:
+                await handler(update, context)
+            finally:
+                resposta_em_curso.reset(marca)
+                self.executando -= 1
+                self.semaforo.release()
+            return True
+        finally:
+            ativos.discard(nome)
+            if not ativos:
+                self.em_execucao.pop(chat_id, None)
+
+def admitir(nome, handler):
+    """Envolve um handler de comando com o controle de admissão"""
+    async def admitido(update, context):
+        await controle_admissao.executar(update.effective_chat.id, nome, handler, update, context)
+    return admitido
+
+# Instância global usada pelos handlers de comandos e botões
+controle_admissao = ControleAdmissao()
+
+registro.contador(
+    'bot_admission_total', 'Decisões do controle de admissão dos handlers', ('resultado',),
+    funcao=lambda: {(resultado,): total for resultado, total in controle_admissao.resultados.items()}
+)
+registro.medidor(
+    'bot_admission_in_flight', 'Handlers em execução e aguardando vaga', ('estado',),
+    funcao=lambda: {('executando',): controle_admissao.executando, ('aguardando',): controle_admissao.aguardando}
+)
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from datetime import datetime
+from config import (logger, alert_state, ALERT_THRESHOLD, ALERT_WIND_THRESHOLD,
+                    ALERT_TEMP_MAX, ALERT_TEMP_MIN, ALERT_HORIZON, ALERT_COOLDOWN)
+from cache import render_cache
+from weather import obter_previsao_tempo_async, buscar_em_lote, formatar_condicao_tempo, obter_emoji_tempo
+from user_config import user_config
+from subscribers import subscriber_registry
+from sender import fila_envio, PRIORIDADE_ALERTA, PRIORIDADE_RELATORIO
+from shared_state import estado_compartilhado
+from workers import deste_worker
+
+def _agrupar(areas):
+    """
+    Monta os grupos das áreas {area: (latitude, longitude)} pelo índice por
+    área do armazenamento, com as localizações carregadas em lote
+    (executado fora do loop de eventos)
+    """
+    grupos = {}
+    for area, (latitude, longitude) in areas.items():
+        chats = [chat_id for chat_id in subscriber_registry.chats_da_area(area) if deste_worker(chat_id)]
+        if chats:
+            grupos[area] = {'latitude': latitude, 'longitude': longitude, 'chats': chats}
+
+    locais = user_config.locais([chat_id for grupo in grupos.values() for chat_id in grupo['chats']])
+    for grupo in grupos.values():
+        grupo['chats'] = [(chat_id, locais[chat_id]) for chat_id in grupo['chats']]
+    return grupos
+
+async def agrupar_assinantes():
+    """
+    Agrupa os assinantes pela área do cache de previsões.
+    Retorna {chave: {'latitude', 'longitude', 'chats': [(chat_id, location)]}}
+    """
+    # As áreas vêm do índice em memória; as consultas ao armazenamento rodam em outra thread
+    areas = {area: (latitude, longitude) for area, (latitude, longitude, _) in subscriber_registry.por_area().items()}
+    return await asyncio.to_thread(_agrupar, areas)
+
+def avaliar_regras(previsao):
+    """
+    Avalia as regras de alerta nas próximas ALERT_HORIZON horas.
+    Retorna uma lista de (tipo, texto)
+    """
+    inicio = previsao.indice_agora()
+    if inicio is None:
+        return []
+
+    eventos = []
+    chance = previsao.maximo('chance_of_rain', inicio, ALERT_HORIZON)
+    if chance >= ALERT_THRESHOLD:
+        eventos.append(('chuva', f"🌧️ Alta probabilidade de chuva: {chance}% nas próximas {ALERT_HORIZON} horas"))
+
+    rajada = previsao.maximo('gust_kph', inicio, ALERT_HORIZON)
+    if rajada >= ALERT_WIND_THRESHOLD:
+        eventos.append(('vento', f"💨 Ventos fortes: rajadas de até {rajada:.0f} km/h"))
+
+    temp_max = previsao.maximo('temp_c', inicio, ALERT_HORIZON)
+    temp_min = previsao.minimo('temp_c', inicio, ALERT_HORIZON)
+    if temp_max >= ALERT_TEMP_MAX:
+        eventos.append(('temperatura', f"🌡️ Calor intenso: até {temp_max:.0f}°C"))
+    elif temp_min <= ALERT_TEMP_MIN:
+        eventos.append(('temperatura', f"🥶 Frio intenso: até {temp_min:.0f}°C"))
+
+    return eventos
+
+async def _buscar_areas(grupos):
+    """Coloca no cache, em lote, as previsões das áreas dos grupos"""
+    try:
+        await buscar_em_lote(
+            {chave: (grupo['latitude'], grupo['longitude']) for chave, grupo in grupos.items()},
+            'curto'
+        )
+    except Exception as e:
+        logger.error(f"Erro na busca em lote: {e}")
+
+def _pode_alertar(ultimos, tipo, chat_id, agora):
+    ultimo = ultimos.get((chat_id, tipo))
+    return ultimo is None or agora - ultimo >= ALERT_COOLDOWN * 60
+
+async def _avaliar_area(grupo, ultimos, enviados):
+    """
+    Avalia uma área e enfileira os alertas dos seus assinantes.
+    `ultimos` tem o horário do último alerta de cada (chat, tipo); os
+    alertas enfileirados são acrescentados a `enviados`
+    """
+    previsao = await obter_previsao_tempo_async(grupo['latitude'], grupo['longitude'], 'curto')
+    if not previsao:
+        return 0
+
+    eventos = avaliar_regras(previsao)
+    if not eventos:
+        return 0
+
+    agora = time.time()
+    notificados = 0
+    for chat_id, location in grupo['chats']:
+        pendentes = [(tipo, texto) for tipo, texto in eventos if _pode_alertar(ultimos, tipo, chat_id, agora)]
+        if not pendentes:
+            continue
+        enviados.extend((chat_id, tipo) for tipo, _ in pendentes)
+
+        mensagem = f"⚠️ **ALERTA - {location['cidade']}/{location['estado']}**\n\n"
+        mensagem += "\n".join(texto for _, texto in pendentes)
+        fila_envio.enfileirar(chat_id, mensagem, PRIORIDADE_ALERTA)
+        notificados += 1
+    return notificados
+
+async def executar_ciclo_alertas(context=None):
+    """
+    Job periódico: avalia as regras uma vez por área e notifica os assinantes.
+    Os horários dos últimos alertas são lidos e gravados no estado
+    compartilhado uma vez por ciclo
+    """
+    grupos = await agrupar_assinantes()
+    if not grupos:
+        return
+
+    intervalos = estado_compartilhado.intervalos
+    chats = [chat_id for grupo in grupos.values() for chat_id, _ in grupo['chats']]
+    try:
+        ultimos = await asyncio.to_thread(intervalos.carregar, chats)
+    except Exception as e:
+        logger.error(f"Erro ao carregar o horário dos últimos alertas: {e}")
+        return
+
+    # Busca de uma vez as áreas sem previsão em cache
+    await _buscar_areas(grupos)
+    enviados = []
+    resultados = await asyncio.gather(
+        *[_avaliar_area(grupo, ultimos, enviados) for grupo in grupos.values()],
+        return_exceptions=True
+    )
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            logger.error(f"Erro ao avaliar alertas: {resultado}")
+
+    if enviados:
+        try:
+            await asyncio.to_thread(intervalos.registrar, enviados, time.time())
+        except Exception as e:
+            logger.error(f"Erro ao gravar o horário dos alertas: {e}")
+
+    notificados = sum(r for r in resultados if isinstance(r, int))
+    logger.info(f"Verificação de alertas concluída: {len(grupos)} área(s), {notificados} alerta(s)")
+
+def montar_resumo_diario(location, previsao, periodo):
+    """
+    Monta o relatório diário: previsão de hoje pela manhã, de amanhã à noite
+    """
+    indice_dia = 1 if periodo == 'evening' and len(previsao.dias) > 1 else 0
+    day = previsao.dias[indice_dia]['day']
+    titulo = "HOJE" if indice_dia == 0 else "AMANHÃ"
+    emoji = obter_emoji_tempo(day['condition']['text'])
+    condicao = formatar_condicao_tempo(day['condition']['text'])
+
+    return f"""
+📅 **RELATÓRIO DIÁRIO - {location['cidade']}/{location['estado']}**
+
+{emoji} **PREVISÃO PARA {titulo}:** {condicao}
+• 🌡️ {day['mintemp_c']}°C - {day['maxtemp_c']}°C
+• 🌧️ Chance de Chuva: {day.get('daily_chance_of_rain', 0)}%
+• 💧 Precipitação: {day.get('totalprecip_mm', 0)}mm
+• 💨 Vento: até {day['maxwind_kph']} km/h
+"""
+
+async def _enviar_resumo_area(chave, grupo, periodo):
+    previsao = await obter_previsao_tempo_async(grupo['latitude'], grupo['longitude'], 'curto')
+    if not previsao:
+        return 0
+
+    for chat_id, location in grupo['chats']:
+        mensagem = render_cache.obter_ou_montar(
+            chave, previsao.versao, 'resumo_diario',
+            (location['cidade'], location['estado'], periodo),
+            lambda: montar_resumo_diario(location, previsao, periodo)
+        )
+        fila_envio.enfileirar(chat_id, mensagem, PRIORIDADE_RELATORIO)
+    return len(grupo['chats'])
+
+async def enviar_relatorio_diario(context):
+    """
+    Job diário: enfileira o relatório para todos os assinantes, com
+    prioridade menor que a dos alertas. `context.job.data` é o período
+    ('morning' ou 'evening')
+    """
+    periodo = context.job.data
+    hoje = datetime.now().date()
+    if alert_state[f'{periodo}_sent'] == hoje:
+        return
+    alert_state[f'{periodo}_sent'] = hoje
+
+    grupos = await agrupar_assinantes()
+    await _buscar_areas(grupos)
+    resultados = await asyncio.gather(
+        *[_enviar_resumo_area(chave, grupo, periodo) for chave, grupo in grupos.items()],
+        return_exceptions=True
+    )
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            logger.error(f"Erro ao montar relatório diário: {resultado}")
+
+    enfileirados = sum(r for r in resultados if isinstance(r, int))
+    logger.info(f"Relatório diário ({periodo}) enfileirado para {enfileirados} assinante(s)")
@@ -0,0 +1,458 @@
+"""
+Benchmark offline dos handlers do bot.
+
+Envia atualizações sintéticas pela Application real (bot.criar_aplicacao),
+com servidores simulados para a Bot API do Telegram e para WeatherAPI,
+ViaCEP e Nominatim, e informa latência p50/p95/p99, vazão e chamadas
+externas por comando/callback.
+
+Uso:
+    python benchmark.py --chats 1000 --rodadas 3 --areas 20
+    python benchmark.py --latencia-api 150 --latencia-telegram 40
+    python benchmark.py --gravar fixtures/      # grava respostas reais (requer WEATHERAPI_KEY)
+    python benchmark.py --fixtures fixtures/    # reproduz as respostas gravadas
+"""
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Estado isolado em um diretório temporário (antes de importar os módulos do bot)
+_DIRETORIO = tempfile.mkdtemp(prefix='bench_bot_')
+os.environ.setdefault('FORECAST_CACHE_DB', os.path.join(_DIRETORIO, 'forecast_cache.db'))
+os.environ.setdefault('USER_SETTINGS_DB', os.path.join(_DIRETORIO, 'user_settings.db'))
+os.environ.setdefault('CEP_INDEX_PATH', os.path.join(_DIRETORIO, 'cep_prefixos.json'))
+os.environ.setdefault('WEATHERAPI_KEY', 'benchmark')
+os.environ.setdefault('WEATHER_PROVIDERS', 'weatherapi')
+
+import httpx
+from telegram import Update
+from telegram.request import BaseRequest
+
+import http_client
+from bot import criar_aplicacao
+from user_config import user_config
+from handlers import available_commands, available_callbacks
+
+TOKEN = '123456:BENCHMARK'
+
+# Comando em execução na tarefa atual, para atribuir as chamadas externas
+_comando_atual = contextvars.ContextVar('comando_atual', default='(outros)')
+
+# Argumentos usados nos comandos que exigem parâmetros
+ARGUMENTOS = {
+    'cep': '59000-000',
+    'chuva': '24',
+    'baixarlona': '12'
+}
+
+class Contadores:
+    """Latências e chamadas externas por comando"""
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.chamadas = defaultdict(lambda: defaultdict(int))
+        self.erros = defaultdict(int)
+
+    def registrar_chamada(self, servico):
+        self.chamadas[_comando_atual.get()][servico] += 1
+
+contadores = Contadores()
+
+def gerar_previsao(latitude, longitude, dias=7):
+    """Payload sintético no formato do forecast.json do WeatherAPI"""
+    inicio = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    forecastday = []
+    for d in range(dias):
+        dia = inicio + timedelta(days=d)
+        horas = []
+        for h in range(24):
+            instante = dia + timedelta(hours=h)
+            horas.append({
+                'time_epoch': int(instante.timestamp()),
+                'time': instante.strftime('%Y-%m-%d %H:%M'),
+                'temp_c': 24 + 6 * random.random(),
+                'chance_of_rain': random.randint(0, 100),
+                'precip_mm': round(random.random() * 2, 2),
+                'wind_kph': round(random.uniform(5, 45), 1),
+                'gust_kph': round(random.uniform(10, 60), 1),
+                'vis_km': 10.0,
+                'condition': {'text': random.choice(['Sunny', 'Partly cloudy', 'Light rain'])}
+            })
+        forecastday.append({
+            'date': dia.strftime('%Y-%m-%d'),
+            'date_epoch': int(dia.timestamp()),
+            'day': {
+                'maxtemp_c': 31.0, 'mintemp_c': 23.0, 'daily_chance_of_rain': random.randint(0, 100),
+                'totalprecip_mm': 3.4, 'maxwind_kph': 30.0, 'condition': {'text': 'Partly cloudy'}
+            },
+            'hour': horas
+        })
+    return {
+        'location': {'name': 'Benchmark', 'lat': latitude, 'lon': longitude},
+        'current': {
+            'temp_c': 28.0, 'feelslike_c': 31.0, 'humidity': 70, 'wind_kph': 18.0, 'gust_kph': 25.0,
+            'wind_dir': 'SE', 'vis_km': 10.0, 'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'condition': {'text': 'Sunny'}
+        },
+        'forecast': {'forecastday': forecastday}
+    }
+
+def _servico(request):
+    """Nome do serviço externo de uma requisição"""
+    host = request.url.host
+    if 'viacep' in host:
+        return 'viacep'
+    if 'nominatim' in host:
+        return 'nominatim'
+    return f"weatherapi:{request.url.path.rsplit('/', 1)[-1]}"
+
+# Parâmetros de credenciais ficam fora da chave das fixtures
+_PARAMETROS_IGNORADOS = {'key', 'apikey'}
+_PARAMETROS_COORDENADAS = {'q', 'lat', 'lon', 'latitude', 'longitude'}
+
+def _normalizar_coordenadas(valor):
+    """Arredonda as coordenadas ('lat,lon' ou listas do lote) para casar chamadas equivalentes"""
+    partes = []
+    for parte in valor.split(','):
+        try:
+            partes.append(f"{float(parte):.4f}")
+        except ValueError:
+            partes.append(parte.strip().lower())
+    return ','.join(partes)
+
+def chave_fixture(request):
+    """
+    Identifica a requisição (serviço, método, caminho, parâmetros normalizados
+    e corpo), de modo que cada local, CEP e perfil tenha sua própria fixture
+    """
+    params = sorted(
+        (nome, _normalizar_coordenadas(valor) if nome in _PARAMETROS_COORDENADAS else valor)
+        for nome, valor in request.url.params.multi_items()
+        if nome not in _PARAMETROS_IGNORADOS
+    )
+    chave = {'servico': _servico(request), 'metodo': request.method,
+             'caminho': request.url.path, 'params': params}
+    if request.content:
+        chave['corpo'] = hashlib.blake2b(request.content, digest_size=8).hexdigest()
+    return chave
+
+def _id_fixture(chave):
+    return hashlib.blake2b(json.dumps(chave, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def _deslocar_datas(valor, dias):
+    """
+    Avança `dias` dias os horários de uma previsão gravada (campos *_epoch,
+    'time' em epoch e datas 'AAAA-MM-DD [HH:MM]'), para que "agora" caia
+    dentro da previsão ao reproduzir fixtures antigas
+    """
+    if isinstance(valor, list):
+        return [_deslocar_datas(item, dias) for item in valor]
+    if not isinstance(valor, dict):
+        return valor
+    segundos = dias * 86400
+    resultado = {}
+    for nome, item in valor.items():
+        if nome.endswith('_epoch') and isinstance(item, int):
+            item += segundos
+        elif nome in ('time', 'date', 'last_updated', 'localtime'):
+            if isinstance(item, int):
+                item += segundos
+            elif isinstance(item, list) and all(isinstance(i, int) for i in item):
+                item = [i + segundos for i in item]
+            elif isinstance(item, str):
+                for formato in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+                    try:
+                        item = (datetime.strptime(item, formato) + timedelta(days=dias)).strftime(formato)
+                        break
+                    except ValueError:
+                        pass
+        else:
+            item = _deslocar_datas(item, dias)
+        resultado[nome] = item
+    return resultado
+
+class TransporteSimulado(httpx.AsyncBaseTransport):
+    """
+    Substituto local de WeatherAPI, ViaCEP e Nominatim, com latência
+    injetada e respostas sintéticas ou reproduzidas de fixtures gravadas
+    """
+    def __init__(self, latencia, fixtures=None):
+        self.latencia = latencia
+        self.fixtures = fixtures or {}
+        self.faltantes = set()
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        servico = _servico(request)
+        contadores.registrar_chamada(servico)
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+
+        if self.fixtures:
+            chave = chave_fixture(request)
+            identificador = _id_fixture(chave)
+            fixture = self.fixtures.get(identificador)
+            if fixture is not None:
+                status, conteudo = fixture
+                return httpx.Response(status, content=conteudo, headers={'Content-Type': 'application/json'})
+            if identificador not in self.faltantes:
+                self.faltantes.add(identificador)
+                logging.warning(f"Sem fixture para {chave}: usando resposta sintética")
+
+        if servico == 'viacep':
+            return httpx.Response(200, json={'localidade': 'Natal', 'uf': 'RN'})
+        if servico == 'nominatim':
+            return httpx.Response(200, json=[{'lat': '-5.7945', 'lon': '-35.2110'}])
+
+        latitude, longitude = (float(v) for v in request.url.params.get('q', '0,0').split(','))
+        return httpx.Response(200, json=gerar_previsao(latitude, longitude))
+
+class TransporteGravador(httpx.AsyncBaseTransport):
+    """
+    Encaminha para a rede real e grava cada resposta como fixture, um
+    arquivo por requisição distinta (ver chave_fixture)
+    """
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.real = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        response = await self.real.handle_async_request(request)
+        conteudo = await response.aread()
+        chave = chave_fixture(request)
+        nome = f"{chave['servico'].replace(':', '_').removesuffix('.json')}_{_id_fixture(chave)}.json"
+        with open(os.path.join(self.diretorio, nome), 'w', encoding='utf-8') as f:
+            json.dump({
+                'requisicao': chave,
+                'gravado_em': time.time(),
+                'status': response.status_code,
+                'corpo': conteudo.decode('utf-8', errors='replace')
+            }, f, ensure_ascii=False)
+        return httpx.Response(response.status_code, headers=response.headers, content=conteudo)
+
+def carregar_fixtures(diretorio):
+    """
+    Lê as fixtures gravadas: {id da requisição: (status, conteúdo)}, com as
+    previsões deslocadas para a data de hoje
+    """
+    fixtures = {}
+    hoje = datetime.now().date()
+    for arquivo in os.listdir(diretorio):
+        if not arquivo.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(diretorio, arquivo), 'r', encoding='utf-8') as f:
+                fixture = json.load(f)
+            conteudo = fixture['corpo']
+            dias = (hoje - datetime.fromtimestamp(fixture['gravado_em']).date()).days
+            if dias and fixture['requisicao']['servico'].startswith('weatherapi'):
+                conteudo = json.dumps(_deslocar_datas(json.loads(conteudo), dias), ensure_ascii=False)
+        except (ValueError, KeyError) as e:
+            logging.warning(f"Fixture inválida ignorada ({arquivo}): {e}")
+            continue
+        fixtures[_id_fixture(fixture['requisicao'])] = (fixture['status'], conteudo.encode('utf-8'))
+    return fixtures
+
+class BotAPISimulada(BaseRequest):
+    """
+    Substituto local da Bot API do Telegram com latência injetada
+    """
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.mensagens = 0
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        metodo = url.rsplit('/', 1)[-1]
+        contadores.registrar_chamada(f"telegram:{metodo}")
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+
+        parametros = request_data.parameters if request_data else {}
+        if metodo == 'getMe':
+            resultado = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif metodo in ('sendMessage', 'editMessageText'):
+            self.mensagens += 1
+            resultado = {
+                'message_id': parametros.get('message_id', self.mensagens),
+                'date': int(time.time()),
+                'chat': {'id': parametros.get('chat_id', 0), 'type': 'private'},
+                'text': parametros.get('text', '')
+            }
+        else:
+            resultado = True
+        return 200, json.dumps({'ok': True, 'result': resultado}).encode()
+
+def _usuario(chat_id):
+    return {'id': chat_id, 'is_bot': False, 'first_name': f"Usuario{chat_id}"}
+
+def criar_update(bot, update_id, chat_id, nome, comando):
+    """Cria uma atualização sintética de comando ou de botão"""
+    chat = {'id': chat_id, 'type': 'private'}
+    mensagem = {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'from': _usuario(chat_id)}
+    if comando:
+        texto = f"/{nome}"
+        if nome in ARGUMENTOS:
+            texto += f" {ARGUMENTOS[nome]}"
+        mensagem['text'] = texto
+        mensagem['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(nome) + 1}]
+        return Update.de_json({'update_id': update_id, 'message': mensagem}, bot)
+
+    mensagem['text'] = 'menu'
+    mensagem['from'] = {'id': 1, 'is_bot': True, 'first_name': 'Bench'}
+    return Update.de_json({
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id), 'from': _usuario(chat_id), 'chat_instance': str(chat_id),
+            'data': nome, 'message': mensagem
+        }
+    }, bot)
+
+def distribuir_locais(chats, areas):
+    """
+    Atribui a cada chat uma de `areas` localizações, espaçadas de 0,1° (em
+    células diferentes do cache de previsões) a partir de Natal
+    """
+    user_config.preparar()
+    colunas = max(1, round(areas ** 0.5))
+    for chat_id in range(1, chats + 1):
+        indice = chat_id % areas
+        user_config.settings_por_chat[chat_id] = {
+            **user_config.default_settings,
+            'cidade': f"Área {indice}",
+            'latitude': round(-5.79 - 0.1 * (indice // colunas), 4),
+            'longitude': round(-35.21 + 0.1 * (indice % colunas), 4)
+        }
+
+def percentil(valores, p):
+    """Percentil por posição mais próxima"""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+async def executar(args):
+    random.seed(args.semente)
+    if args.gravar:
+        os.makedirs(args.gravar, exist_ok=True)
+        http_client.usar_transporte(TransporteGravador(args.gravar))
+    else:
+        fixtures = carregar_fixtures(args.fixtures) if args.fixtures else None
+        http_client.usar_transporte(TransporteSimulado(args.latencia_api / 1000, fixtures))
+
+    app = criar_aplicacao(TOKEN, request=BotAPISimulada(args.latencia_telegram / 1000))
+    # process_update só retorna após o handler terminar (o bot não bloqueia nos botões)
+    for grupo in app.handlers.values():
+        for handler in grupo:
+            handler.block = True
+    await app.initialize()
+
+    alvos = [(nome, True) for nome in available_commands] + [(nome, False) for nome in available_callbacks]
+    if args.comandos:
+        alvos = [(nome, comando) for nome, comando in alvos if nome in args.comandos.split(',')]
+
+    # Coordenadas distribuídas para simular várias áreas
+    distribuir_locais(args.chats, args.areas)
+    semaforo = asyncio.Semaphore(args.concorrencia)
+    update_id = 0
+
+    async def processar(chat_id, nome, comando, numero):
+        async with semaforo:
+            rotulo = f"/{nome}" if comando else f"[{nome}]"
+            _comando_atual.set(rotulo)
+            update = criar_update(app.bot, numero, chat_id, nome, comando)
+            inicio = time.perf_counter()
+            try:
+                await app.process_update(update)
+            except Exception:
+                contadores.erros[rotulo] += 1
+            contadores.latencias[rotulo].append((time.perf_counter() - inicio) * 1000)
+
+    inicio_total = time.perf_counter()
+    for _ in range(args.rodadas):
+        tarefas = []
+        for chat_id in range(1, args.chats + 1):
+            nome, comando = random.choice(alvos)
+            update_id += 1
+            tarefas.append(processar(chat_id, nome, comando, update_id))
+        await asyncio.gather(*tarefas)
+    duracao = time.perf_counter() - inicio_total
+
+    await app.shutdown()
+    await http_client.fechar_clientes()
+    return duracao
+
+def relatorio(duracao, como_json=False):
+    total = sum(len(v) for v in contadores.latencias.values())
+    linhas = []
+    for rotulo in sorted(contadores.latencias):
+        valores = contadores.latencias[rotulo]
+        linhas.append({
+            'comando': rotulo,
+            'n': len(valores),
+            'p50_ms': round(percentil(valores, 50), 2),
+            'p95_ms': round(percentil(valores, 95), 2),
+            'p99_ms': round(percentil(valores, 99), 2),
+            'erros': contadores.erros.get(rotulo, 0),
+            'chamadas': dict(contadores.chamadas.get(rotulo, {}))
+        })
+    resumo = {
+        'atualizacoes': total,
+        'duracao_s': round(duracao, 3),
+        'vazao_por_s': round(total / duracao, 1) if duracao else 0.0,
+        'comandos': linhas,
+        'outras_chamadas': dict(contadores.chamadas.get('(outros)', {}))
+    }
+    if como_json:
+        print(json.dumps(resumo, ensure_ascii=False, indent=2))
+        return
+
+    print(f"\n📊 {total} atualizações em {duracao:.2f}s ({resumo['vazao_por_s']}/s)\n")
+    print(f"{'comando':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erros':>7}  chamadas externas")
+    for linha in linhas:
+        chamadas = ', '.join(f"{s}={n}" for s, n in sorted(linha['chamadas'].items()))
+        print(f"{linha['comando']:<22}{linha['n']:>6}{linha['p50_ms']:>10}{linha['p95_ms']:>10}"
+              f"{linha['p99_ms']:>10}{linha['erros']:>7}  {chamadas}")
+    if resumo['outras_chamadas']:
+        print(f"\nOutras chamadas: {resumo['outras_chamadas']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline dos handlers do bot")
+    parser.add_argument('--chats', type=int, default=1000, help="chats simultâneos por rodada")
+    parser.add_argument('--rodadas', type=int, default=3, help="quantidade de rodadas")
+    parser.add_argument('--areas', type=int, default=20, help="áreas distintas entre as quais os chats são distribuídos")
+    parser.add_argument('--concorrencia', type=int, default=1000, help="atualizações processadas ao mesmo tempo")
+    parser.add_argument('--latencia-api', type=float, default=100, help="latência simulada das APIs de clima/CEP (ms)")
+    parser.add_argument('--latencia-telegram', type=float, default=30, help="latência simulada da Bot API (ms)")
+    parser.add_argument('--comandos', help="lista separada por vírgulas de comandos/callbacks a exercitar")
+    parser.add_argument('--fixtures', help="diretório com respostas gravadas para reproduzir")
+    parser.add_argument('--gravar', help="grava respostas reais no diretório informado")
+    parser.add_argument('--semente', type=int, default=42, help="semente aleatória")
+    parser.add_argument('--json', action='store_true', help="saída em JSON")
+    args = parser.parse_args()
+
+    # Evita que o log de cada requisição distorça as medições
+    logging.getLogger().setLevel(logging.WARNING)
+
+    duracao = asyncio.run(executar(args))
+    relatorio(duracao, args.json)
+
+if __name__ == '__main__':
+    main()
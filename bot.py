@@ -1,10 +1,114 @@
 import os
+import secrets
 import threading
 import asyncio
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler
-from config import logger, UPDATE_INTERVAL, ALERT_THRESHOLD
+from datetime import time
+from zoneinfo import ZoneInfo
+from config import (logger, UPDATE_INTERVAL, ALERT_THRESHOLD, weather_cache, DAILY_REPORT_HOURS, TIMEZONE,
+                    BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    WEBHOOK_MAX_CONNECTIONS, TELEGRAM_API_URL, CONCURRENT_UPDATES, METRICS_PORT,
+                    WORKERS, WORKER_INDEX, WEATHER_PROVIDERS)
 from handlers import available_commands, available_callbacks
 from user_config import user_config
+from http_client import fechar_clientes
+from weather import atualizar_locais_ativos
+from providers import provedores_ativos
+from shared_state import estado_compartilhado
+from alerts import executar_ciclo_alertas, enviar_relatorio_diario
+from sender import fila_envio
+from utils import debounce_chat, enviar_resposta
+from metrics import medir_handler, iniciar_servidor_metricas, latencia_handler, Cronometro
+from startup import Cronologia, preparar_inicializacao
+from admission import admitir, controle_admissao
+from workers import executar_multiprocesso
+
+def criar_aplicacao(telegram_token, request=None, com_updater=True):
+    """
+    Cria a aplicação do Telegram com handlers e jobs registrados.
+    `request` substitui o cliente da Bot API (usado pelo benchmark);
+    sem updater, as atualizações chegam pelo supervisor (modo multiprocesso)
+    """
+    builder = (
+        ApplicationBuilder()
+        .token(telegram_token)
+        .post_init(inicializar)
+        .post_shutdown(finalizar)
+        .concurrent_updates(CONCURRENT_UPDATES)
+    )
+    if not com_updater:
+        builder = builder.updater(None)
+    if request is not None:
+        builder = builder.request(request)
+    elif TELEGRAM_API_URL:
+        builder = (
+            builder
+            .base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+            .base_file_url(f"{TELEGRAM_API_URL.rstrip('/')}/file/bot")
+        )
+    app = builder.build()
+    
+    # Registra os comandos
+    for comando, handler in available_commands.items():
+        app.add_handler(CommandHandler(comando, medir_handler('comando', comando, admitir(comando, handler))))
+        logger.info(f"Comando /{comando} registrado")
+    
+    # Adiciona handler para botões (sem bloquear: a espera do agrupamento
+    # de cliques não atrasa as demais atualizações)
+    app.add_handler(CallbackQueryHandler(button_handler, block=False))
+    
+    # Agenda a atualização em segundo plano dos locais mais consultados
+    if app.job_queue:
+        app.job_queue.run_repeating(
+            atualizar_locais_ativos,
+            interval=weather_cache['refresh_job_interval'],
+            first=weather_cache['refresh_job_interval']
+        )
+        logger.info("Atualização em segundo plano do cache agendada")
+        
+        app.job_queue.run_repeating(
+            executar_ciclo_alertas,
+            interval=UPDATE_INTERVAL * 60,
+            first=60
+        )
+        logger.info(f"Verificação de alertas agendada a cada {UPDATE_INTERVAL} minutos")
+        
+        for periodo, hora in DAILY_REPORT_HOURS.items():
+            app.job_queue.run_daily(
+                enviar_relatorio_diario,
+                time=time(hour=hora, tzinfo=ZoneInfo(TIMEZONE)),
+                data=periodo,
+                name=f"relatorio_{periodo}"
+            )
+        logger.info(f"Relatórios diários agendados às {', '.join(f'{h}h' for h in DAILY_REPORT_HOURS.values())}")
+    else:
+        logger.error(
+            "JobQueue indisponível: atualização do cache, alertas e relatórios diários desativados. "
+            "Instale python-telegram-bot[job-queue] (pip install -r requirements.txt)"
+        )
+    
+    return app
+
+def executar_webhook(app):
+    """
+    Recebe as atualizações por webhook (servidor HTTP embutido),
+    validando o cabeçalho secreto enviado pelo Telegram
+    """
+    secret = WEBHOOK_SECRET
+    if not secret:
+        secret = secrets.token_urlsafe(32)
+        logger.warning("WEBHOOK_SECRET não configurado: usando um segredo aleatório")
+    
+    webhook_url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+    logger.info(f"Webhook escutando em {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}")
+    app.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=webhook_url,
+        secret_token=secret,
+        max_connections=WEBHOOK_MAX_CONNECTIONS
+    )
 
 def main():
     """
@@ -12,20 +116,33 @@ def main():
     """
     # Verifica variáveis de ambiente
     telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    weather_api_key = os.getenv("WEATHERAPI_KEY")
     
     if not telegram_token:
         logger.error("TELEGRAM_BOT_TOKEN não configurado")
         print("❌ Configure a variável de ambiente TELEGRAM_BOT_TOKEN")
         exit(1)
     
-    if not weather_api_key:
-        logger.error("WEATHERAPI_KEY não configurado")
-        print("❌ Configure a variável de ambiente WEATHERAPI_KEY")
+    # O Open-Meteo dispensa chave: basta um dos provedores configurados estar disponível
+    if not any(provedor.disponivel() for provedor in provedores_ativos):
+        logger.error(f"Nenhum provedor de previsão disponível ({', '.join(WEATHER_PROVIDERS)})")
+        print("❌ Configure a variável de ambiente WEATHERAPI_KEY ou inclua 'openmeteo' em WEATHER_PROVIDERS")
         exit(1)
     
+    if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+        logger.error("WEBHOOK_URL não configurado")
+        print("❌ Configure a variável de ambiente WEBHOOK_URL para o modo webhook")
+        exit(1)
+    
+    if WORKERS > 1 and BOT_MODE != 'webhook':
+        logger.error("WORKERS > 1 exige BOT_MODE=webhook")
+        print("❌ O modo multiprocesso (WORKERS > 1) exige BOT_MODE=webhook")
+        exit(1)
+    
+    cronologia = Cronologia()
+    
     # Carrega configurações do usuário
-    location = user_config.get_location()
+    with cronologia.fase('configuracoes'):
+        location = user_config.get_location()
     
     logger.info("Iniciando Bot de Previsão do Tempo")
     print(f"🤖 Iniciando Bot de Previsão do Tempo")
@@ -33,26 +150,27 @@ def main():
     print(f"⏰ Intervalo de verificação: {UPDATE_INTERVAL} minutos")
     print(f"🚨 Limite de alerta: {ALERT_THRESHOLD}% de chance de chuva")
     
-    # Configura o bot do Telegram
-    app = ApplicationBuilder().token(telegram_token).build()
-    
-    # Registra os comandos
-    for comando, handler in available_commands.items():
-        app.add_handler(CommandHandler(comando, handler))
-        logger.info(f"Comando /{comando} registrado")
-    
-    # Adiciona handler para botões
-    app.add_handler(CallbackQueryHandler(button_handler))
+    # Configura o bot do Telegram (no modo multiprocesso, cada worker cria a sua aplicação)
+    if WORKERS <= 1:
+        with cronologia.fase('aplicacao'):
+            app = criar_aplicacao(telegram_token)
+        app.bot_data['cronologia'] = cronologia
     
     print("\n✅ Bot configurado e pronto!")
+    print(f"🔌 Modo: {BOT_MODE}" + (f" ({WORKERS} workers)" if WORKERS > 1 else ""))
     print("📱 Comandos disponíveis:")
     for comando in available_commands:
         print(f"   • /{comando}")
     
     try:
         # Inicia o bot
-        logger.info("Bot iniciado e rodando...")
-        app.run_polling()
+        logger.info(f"Bot iniciado e rodando ({BOT_MODE})...")
+        if WORKERS > 1:
+            executar_multiprocesso(telegram_token)
+        elif BOT_MODE == 'webhook':
+            executar_webhook(app)
+        else:
+            app.run_polling()
     except KeyboardInterrupt:
         logger.info("Bot interrompido pelo usuário")
         print("\n🛑 Bot interrompido pelo usuário")
@@ -60,34 +178,64 @@ def main():
         logger.error(f"Erro crítico no bot: {e}")
         print(f"\n❌ Erro crítico: {e}")
     finally:
+        estado_compartilhado.fechar()
         logger.info("Bot finalizado")
         print("👋 Bot finalizado!")
 
+async def inicializar(app):
+    """
+    Inicia os serviços em segundo plano e aquece o cache antes de o bot
+    começar a receber atualizações
+    """
+    cronologia = app.bot_data.setdefault('cronologia', Cronologia())
+    with cronologia.fase('servicos'):
+        await fila_envio.iniciar(app.bot)
+        # Cada worker expõe as suas métricas em METRICS_PORT + índice
+        app.bot_data['servidor_metricas'] = await iniciar_servidor_metricas(
+            METRICS_PORT + WORKER_INDEX if METRICS_PORT else 0
+        )
+    await preparar_inicializacao(cronologia)
+    logger.info(f"Inicialização concluída: {cronologia.resumo()}")
+
+async def finalizar(app):
+    """
+    Libera recursos no desligamento da aplicação
+    """
+    await fila_envio.parar()
+    servidor = app.bot_data.get('servidor_metricas')
+    if servidor is not None:
+        servidor.close()
+    await fechar_clientes()
+    await user_config.finalizar_gravacao()
+
 async def button_handler(update, context):
     """
     Manipula os botões interativos do menu
     """
     query = update.callback_query
     await query.answer()
-    
+
+    # Cliques do mesmo chat durante um clique em execução: apenas o mais novo é executado depois
+    await debounce_chat.executar(update.effective_chat.id, lambda: _processar_clique(update, context))
+
+async def _processar_clique(update, context):
+    query = update.callback_query
     try:
         if query.data in available_callbacks:
-            await available_callbacks[query.data](update, context)
+            with Cronometro(latencia_handler, 'callback', query.data):
+                await controle_admissao.executar(
+                    update.effective_chat.id, query.data, available_callbacks[query.data], update, context
+                )
         else:
             logger.warning(f"Callback não tratado: {query.data}")
             if query.message:
-                await query.message.edit_text(
-                    "❌ Opção inválida ou não implementada",
-                    parse_mode='Markdown'
-                )
+                # Pelo enviar_resposta, para que o hash da tela exibida seja atualizado
+                await enviar_resposta(update, "❌ Opção inválida ou não implementada")
             
     except Exception as e:
         logger.error(f"Erro no button_handler: {e}")
         if query.message:
-            await query.message.edit_text(
-                "❌ Ocorreu um erro ao processar sua solicitação. Tente novamente.",
-                parse_mode='Markdown'
-            )
+            await enviar_resposta(update, "❌ Ocorreu um erro ao processar sua solicitação. Tente novamente.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import weather_cache
+from metrics import registro
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash(latitude, longitude, precisao=5):
+    """
+    Codifica coordenadas em geohash com a precisão informada
+    """
+    lat_min, lat_max = -90.0, 90.0
+    lon_min, lon_max = -180.0, 180.0
+    resultado = []
+    bits, bit_count, par = 0, 0, True
+
+    while len(resultado) < precisao:
+        if par:
+            meio = (lon_min + lon_max) / 2
+            if longitude >= meio:
+                bits = (bits << 1) | 1
+                lon_min = meio
+            else:
+                bits <<= 1
+                lon_max = meio
+        else:
+            meio = (lat_min + lat_max) / 2
+            if latitude >= meio:
+                bits = (bits << 1) | 1
+                lat_min = meio
+            else:
+                bits <<= 1
+                lat_max = meio
+        par = not par
+        bit_count += 1
+        if bit_count == 5:
+            resultado.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return ''.join(resultado)
+
+def celula_grade(latitude, longitude, tamanho=0.05):
+    """
+    Retorna a célula de uma grade regular de `tamanho` graus
+    """
+    return f"g{int(latitude // tamanho)}:{int(longitude // tamanho)}"
+
+class TTLCache:
+    """
+    Cache LRU simples com expiração por entrada
+    """
+    def __init__(self, duracao_minutos, max_entradas=1024):
+        self.duracao = timedelta(minutes=duracao_minutos)
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()
+
+    def obter(self, chave):
+        """Retorna o valor válido da chave, ou None"""
+        entrada = self.entradas.get(chave)
+        if entrada is None:
+            return None
+        valor, timestamp = entrada
+        if datetime.now() - timestamp >= self.duracao:
+            del self.entradas[chave]
+            return None
+        self.entradas.move_to_end(chave)
+        return valor
+
+    def definir(self, chave, valor):
+        """Armazena o valor, removendo a entrada menos usada se necessário"""
+        self.entradas[chave] = (valor, datetime.now())
+        self.entradas.move_to_end(chave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+
+class ForecastCache:
+    """
+    Cache de previsões por área (geohash ou grade) com expiração e LRU.
+    Dados vencidos continuam disponíveis por até `stale_max` minutos
+    enquanto são atualizados em segundo plano.
+    """
+    def __init__(self, duracao_minutos=15, max_entradas=256, modo='geohash',
+                 precisao=5, tamanho_grade=0.05, stale_max=60, refresh_ahead=3):
+        self.duracao = timedelta(minutes=duracao_minutos)
+        self.stale_max = timedelta(minutes=max(stale_max, duracao_minutos))
+        self.refresh_ahead = timedelta(minutes=refresh_ahead)
+        self.max_entradas = max_entradas
+        self.modo = modo
+        self.precisao = precisao
+        self.tamanho_grade = tamanho_grade
+        self.entradas = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.ao_remover = []  # funções chamadas com a chave removida ou substituída
+
+    def chave(self, latitude, longitude):
+        """Retorna a chave da área que contém as coordenadas"""
+        if self.modo == 'grade':
+            return celula_grade(latitude, longitude, self.tamanho_grade)
+        return geohash(latitude, longitude, self.precisao)
+
+    def consultar(self, chave, aceitar=None):
+        """
+        Retorna (dados, fresco) para a chave. Dados vencidos dentro do limite
+        de `stale_max` são retornados com fresco=False; além disso, (None, False).
+        `aceitar(dados)` (opcional) recusa entradas que não atendem ao pedido
+        (contadas como falha, sem removê-las)
+        """
+        entrada = self.entradas.get(chave)
+        if entrada is None or (aceitar is not None and not aceitar(entrada['data'])):
+            self.misses += 1
+            return None, False
+
+        agora = datetime.now()
+        idade = agora - entrada['timestamp']
+        if idade >= self.stale_max:
+            del self.entradas[chave]
+            self._notificar_remocao(chave)
+            self.misses += 1
+            return None, False
+
+        entrada['acesso'] = agora
+        self.entradas.move_to_end(chave)
+        if idade >= self.duracao:
+            self.stale_hits += 1
+            return entrada['data'], False
+
+        self.hits += 1
+        return entrada['data'], True
+
+    def obter(self, chave, aceitar=None):
+        """Retorna os dados em cache válidos para a chave, ou None"""
+        data, fresco = self.consultar(chave, aceitar)
+        return data if fresco else None
+
+    def espiar(self, chave):
+        """Dados válidos da chave sem contar acesso nem estatísticas, ou None"""
+        entrada = self.entradas.get(chave)
+        if entrada is None or datetime.now() - entrada['timestamp'] >= self.duracao:
+            return None
+        return entrada['data']
+
+    def definir(self, chave, data, latitude, longitude, timestamp=None):
+        """Armazena os dados da chave, removendo o local menos usado se necessário"""
+        agora = datetime.now()
+        anterior = self.entradas.get(chave)
+        if anterior is not None:
+            self._notificar_remocao(chave)
+        self.entradas[chave] = {
+            'data': data,
+            'timestamp': timestamp or agora,
+            'latitude': latitude,
+            'longitude': longitude,
+            'acesso': anterior['acesso'] if anterior else agora
+        }
+        self.entradas.move_to_end(chave)
+        while len(self.entradas) > self.max_entradas:
+            removida, _ = self.entradas.popitem(last=False)
+            self._notificar_remocao(removida)
+
+    def _notificar_remocao(self, chave):
+        for funcao in self.ao_remover:
+            funcao(chave)
+
+    def chaves_para_atualizar(self, minutos_ativos):
+        """
+        Lista (chave, latitude, longitude, dados) dos locais consultados nos
+        últimos `minutos_ativos` minutos cujos dados vencem em breve
+        """
+        agora = datetime.now()
+        limite_acesso = agora - timedelta(minutes=minutos_ativos)
+        limite_idade = self.duracao - self.refresh_ahead
+        return [
+            (chave, e['latitude'], e['longitude'], e['data'])
+            for chave, e in self.entradas.items()
+            if e['acesso'] >= limite_acesso and agora - e['timestamp'] >= limite_idade
+        ]
+
+    def estatisticas(self):
+        """Retorna contadores de acertos, falhas e tamanho do cache"""
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.stale_hits) / total if total else 0.0,
+            'tamanho': len(self.entradas)
+        }
+
+class RenderCache:
+    """
+    Mensagens já formatadas por área, versão da previsão e tela.
+    As entradas de uma área são descartadas junto com a previsão no ForecastCache.
+    """
+    def __init__(self):
+        self.entradas = {}
+        self.hits = 0
+        self.misses = 0
+
+    def obter_ou_montar(self, chave, versao, tela, variante, montar):
+        """
+        Retorna a mensagem em cache para (versão, tela, variante) da área,
+        chamando `montar()` apenas na primeira vez
+        """
+        da_area = self.entradas.setdefault(chave, {})
+        id_render = (versao, tela, variante)
+        mensagem = da_area.get(id_render)
+        if mensagem is None:
+            self.misses += 1
+            mensagem = montar()
+            da_area[id_render] = mensagem
+        else:
+            self.hits += 1
+        return mensagem
+
+    def invalidar(self, chave):
+        """Descarta as mensagens da área"""
+        self.entradas.pop(chave, None)
+
+# Instância global do cache de previsões
+forecast_cache = ForecastCache(
+    duracao_minutos=weather_cache['cache_duration'],
+    max_entradas=weather_cache['max_entries'],
+    modo=weather_cache['key_mode'],
+    precisao=weather_cache['geohash_precision'],
+    tamanho_grade=weather_cache['grid_size'],
+    stale_max=weather_cache['stale_max'],
+    refresh_ahead=weather_cache['refresh_ahead']
+)
+
+# Mensagens renderizadas, invalidadas junto com as previsões
+render_cache = RenderCache()
+forecast_cache.ao_remover.append(render_cache.invalidar)
+
+# Métricas de efetividade do cache
+registro.contador(
+    'bot_forecast_cache_requests_total', 'Consultas ao cache de previsões por resultado', ('resultado',),
+    funcao=lambda: {('hit',): forecast_cache.hits, ('stale',): forecast_cache.stale_hits,
+                    ('miss',): forecast_cache.misses}
+)
+registro.medidor(
+    'bot_forecast_cache_hit_ratio', 'Fração de consultas atendidas pelo cache (inclui vencidas)',
+    funcao=lambda: {(): forecast_cache.estatisticas()['hit_ratio']}
+)
+registro.medidor(
+    'bot_forecast_cache_entries', 'Áreas no cache de previsões',
+    funcao=lambda: {(): len(forecast_cache.entradas)}
+)
+registro.medidor(
+    'bot_render_cache_entries', 'Áreas com mensagens renderizadas em cache',
+    funcao=lambda: {(): len(render_cache.entradas)}
+)
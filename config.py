@@ -1,15 +1,28 @@
 import os
 import logging
+from log_setup import configurar_logging
 
-# Configuração de logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler('bot_weather.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configuração de logging (fila + thread de escrita, rotação e mascaramento de segredos)
+LOG_FILE = os.getenv('LOG_FILE', 'bot_weather.log')  # vazio registra apenas no console
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'texto')  # 'texto' ou 'json' (uma linha JSON por registro)
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'tamanho')  # 'tamanho' ou 'tempo' (diária)
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+
+# Processos (modo multiprocesso: um supervisor recebe o webhook e distribui
+# as atualizações entre os workers pelo chat_id)
+WORKERS = int(os.getenv('WORKERS', '1'))  # >1 exige BOT_MODE=webhook
+WORKER_INDEX = int(os.getenv('WORKER_INDEX', '0'))  # definido pelo supervisor em cada worker
+WORKER_QUEUE_MAX = 1000  # atualizações aguardando cada worker; acima disso o webhook responde 503
+WEBHOOK_MAX_BODY = 1024 * 1024  # bytes aceitos por atualização no webhook do supervisor (acima: 413)
+WEBHOOK_READ_TIMEOUT = 10  # segundos para receber cada parte da requisição no webhook do supervisor
+if WORKERS > 1 and LOG_FILE and 'WORKER_INDEX' in os.environ:
+    # Um arquivo por worker: a rotação não é segura entre processos
+    _raiz, _extensao = os.path.splitext(LOG_FILE)
+    LOG_FILE = f"{_raiz}.worker{WORKER_INDEX}{_extensao}"
+
+configurar_logging(LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_ROTATION, LOG_MAX_BYTES, LOG_BACKUP_COUNT)
 logger = logging.getLogger(__name__)
 
 # Configurações principais
@@ -18,6 +31,103 @@ LONGITUDE = -35.24775350308109
 CIDADE_NOME = "Natal, RN"
 UPDATE_INTERVAL = 30  # minutos para verificar previsão
 ALERT_THRESHOLD = 70  # % de chance de chuva para alertas
+ALERT_WIND_THRESHOLD = 40  # km/h (rajadas) para alertas de vento
+ALERT_TEMP_MAX = 36  # °C para alertas de calor
+ALERT_TEMP_MIN = 12  # °C para alertas de frio
+ALERT_HORIZON = 3  # horas à frente avaliadas a cada ciclo
+ALERT_COOLDOWN = 180  # minutos entre alertas do mesmo tipo para um usuário
+
+# Horizontes (horas) aceitos por /chuva e /baixarlona
+RAIN_HORIZONS = (6, 12, 24, 48)
+RAIN_HORIZON_DEFAULT = 6
+LONA_HORIZON_DEFAULT = 12
+
+# Modo de execução: 'polling' ou 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # URL pública, ex.: https://meubot.exemplo.com
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # vazio gera um segredo aleatório
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')  # servidor alternativo da Bot API (ex.: falso local para testes)
+
+# Configurações de rede
+WEATHERAPI_URL = os.getenv('WEATHERAPI_URL', "http://api.weatherapi.com/v1")
+OPENMETEO_URL = os.getenv('OPENMETEO_URL', "https://api.open-meteo.com/v1")
+HTTP_TIMEOUT = 10  # segundos por requisição
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+
+# Provedores de previsão, em ordem de preferência ('weatherapi', 'openmeteo')
+WEATHER_PROVIDERS = [p.strip() for p in os.getenv('WEATHER_PROVIDERS', 'weatherapi,openmeteo').split(',') if p.strip()]
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', '1') == '1'  # dispara o próximo provedor se o atual demorar
+HEDGE_DEFAULT_DELAY = 1.0  # segundos de espera enquanto não há amostras de latência
+HEDGE_MIN_DELAY = 0.2  # limites da espera calculada pelo p95 (segundos)
+HEDGE_MAX_DELAY = 3.0
+HEDGE_SAMPLES = 100  # latências recentes usadas no p95 de cada provedor
+
+# Busca em lote (varreduras de alertas e atualização em segundo plano)
+WEATHERAPI_BULK = os.getenv('WEATHERAPI_BULK', '0') == '1'  # endpoint q=bulk (planos pagos do WeatherAPI)
+BULK_MAX_LOCATIONS = 50  # locais por requisição em lote
+BULK_FALLBACK_CONCURRENCY = 8  # buscas individuais simultâneas quando não há lote
+
+# Perfis de busca, do menor para o maior: um perfil em cache atende pedidos dos anteriores
+FETCH_PROFILES = {
+    'atual': {'dias': 0},  # apenas condições atuais
+    'curto': {'dias': 3},  # horas de hoje e dos próximos dois dias (horizontes até 48 h)
+    'completo': {'dias': 7, 'aqi': True, 'alerts': True}
+}
+
+# Envio proativo (limites da Bot API do Telegram)
+SEND_GLOBAL_RATE = 30  # mensagens por segundo no total
+SEND_CHAT_RATE = 1  # mensagens por segundo por chat
+SEND_CHAT_BURST = 3  # rajada máxima por chat
+SEND_MAX_CONCURRENT = 8  # envios simultâneos
+SEND_MAX_RETRIES = 3  # tentativas em erros de rede
+
+# Botões do menu
+CALLBACK_DEBOUNCE = True  # cliques do chat durante um clique em execução são agrupados: só o mais novo roda depois (False desativa)
+MESSAGE_HASH_MAX = 10000  # mensagens com hash de conteúdo guardado (edições iguais são omitidas)
+
+# Controle de admissão dos handlers
+CONCURRENT_UPDATES = 256  # atualizações processadas simultaneamente pela aplicação
+ADMISSION_GLOBAL_LIMIT = 32  # handlers executando ao mesmo tempo no bot
+ADMISSION_CHAT_LIMIT = 2  # handlers executando ao mesmo tempo por chat
+ADMISSION_QUEUE_MAX = 200  # handlers aguardando vaga; acima disso, resposta imediata de "ocupado"
+ADMISSION_WAIT_TIMEOUT = 5.0  # segundos máximos aguardando vaga
+ADMISSION_CACHE_MAX = 5000  # últimas respostas por (chat, comando) usadas sob sobrecarga
+
+# Relatórios diários
+TIMEZONE = os.getenv('BOT_TIMEZONE', 'America/Fortaleza')
+DAILY_REPORT_HOURS = {'morning': 7, 'evening': 19}
+
+# Configurações por chat
+SETTINGS_DB = os.getenv('USER_SETTINGS_DB', 'user_settings.db')
+SETTINGS_FLUSH_DELAY = 2  # segundos para agrupar gravações
+
+# Geocodificação de CEP (ViaCEP + Nominatim)
+VIACEP_URL = "https://viacep.com.br/ws"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+GEOCODING_CACHE_DAYS = 30  # validade dos resultados em cache
+NOMINATIM_MAX_CONCURRENT = 1  # política de uso do Nominatim
+NOMINATIM_MIN_INTERVAL = 1.0  # segundos entre requisições
+CEP_INDEX_PATH = os.getenv('CEP_INDEX_PATH', 'cep_prefixos.json')  # vazio desativa o índice local
+
+# Inicialização: aquecimento do cache com as áreas dos assinantes
+STARTUP_WARM_CONCURRENCY = int(os.getenv('STARTUP_WARM_CONCURRENCY', '8'))  # buscas simultâneas
+STARTUP_WARM_FRACTION = float(os.getenv('STARTUP_WARM_FRACTION', '0.8'))  # fração aquecida para começar a atender
+STARTUP_WARM_TIMEOUT = float(os.getenv('STARTUP_WARM_TIMEOUT', '20'))  # segundos máximos de espera
+
+# Estado compartilhado entre processos (cache de previsões, assinantes e intervalos de alerta)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')  # 'sqlite' (arquivos locais) ou 'redis'
+REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+REDIS_PREFIX = os.getenv('REDIS_PREFIX', 'clima:')  # prefixo das chaves no Redis
+
+# Métricas no formato Prometheus
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 desativa o endpoint /metrics (worker N usa a porta + N)
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # segundos
 
 # Configurações do Drone
 DRONE_CONFIG = {
@@ -40,20 +150,27 @@ FLIGHT_LIMITS = {
     'max_temp': 40,  # °C
 }
 
+# Planejamento de janelas de voo
+DRONE_MAX_WINDOWS = 3  # janelas exibidas por perfil
+DRONE_MAX_PROFILES = 5  # perfis personalizados por chat
+
 # Estado dos alertas
+# (o horário do último alerta de cada tipo por chat fica no estado compartilhado)
 alert_state = {
-    'last_rain_alert': None,
-    'last_wind_alert': None,
-    'last_temp_alert': None,
-    'morning_sent': False,
-    'evening_sent': False,
-    'users_subscribed': set(),
-    'drone_locations': {}
+    'morning_sent': None,  # data do último relatório da manhã
+    'evening_sent': None,  # data do último relatório da noite
+    'drone_locations': {}  # chat_id -> {nome do perfil: configuração do drone}
 }
 
 # Cache de dados
 weather_cache = {
-    'data': None,
-    'timestamp': None,
-    'cache_duration': 15  # minutos
+    'cache_duration': 15,  # minutos
+    'stale_max': 60,  # minutos em que dados vencidos ainda podem ser servidos
+    'refresh_ahead': 3,  # minutos antes do vencimento para atualizar em segundo plano
+    'refresh_job_interval': 60,  # segundos entre execuções do job de atualização
+    'max_entries': 256,  # locais mantidos em memória (LRU)
+    'key_mode': 'geohash',  # 'geohash' ou 'grade'
+    'geohash_precision': 5,  # ~5 km por célula
+    'grid_size': 0.05,  # graus por célula no modo 'grade'
+    'disk_path': os.getenv('FORECAST_CACHE_DB', 'forecast_cache.db')  # vazio desativa o cache em disco
 } 
\ No newline at end of file
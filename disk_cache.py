@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import threading
+import time
+from config import logger
+from forecast_model import PERFIL_COMPLETO
+
+class DiskCache:
+    """
+    Camada persistente (SQLite) sob o cache em memória. Guarda o payload
+    bruto da API com o horário da busca e a chave da área, para que o bot
+    reinicie com o cache aquecido.
+    """
+    def __init__(self, caminho, idade_maxima_minutos=60):
+        self.caminho = caminho
+        self.idade_maxima = idade_maxima_minutos * 60
+        self._conexao = None
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        """Abre o banco sob demanda (leitura preguiçosa na inicialização)"""
+        if self._conexao is None:
+            self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute(f"""
+                CREATE TABLE IF NOT EXISTS previsoes (
+                    chave TEXT PRIMARY KEY,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    timestamp REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    perfil TEXT NOT NULL DEFAULT '{PERFIL_COMPLETO}'
+                )
+            """)
+            colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(previsoes)")}
+            if 'perfil' not in colunas:
+                # Bancos anteriores aos perfis de busca guardavam sempre a previsão completa
+                self._conexao.execute(
+                    f"ALTER TABLE previsoes ADD COLUMN perfil TEXT NOT NULL DEFAULT '{PERFIL_COMPLETO}'"
+                )
+            # Descarta entradas antigas demais para serem servidas
+            self._conexao.execute(
+                "DELETE FROM previsoes WHERE timestamp < ?",
+                (time.time() - self.idade_maxima,)
+            )
+            self._conexao.commit()
+        return self._conexao
+
+    def carregar(self, chave):
+        """
+        Retorna (payload, timestamp, latitude, longitude, perfil) da área, ou None
+        """
+        try:
+            with self._lock:
+                linha = self._conectar().execute(
+                    "SELECT payload, timestamp, latitude, longitude, perfil FROM previsoes WHERE chave = ?",
+                    (chave,)
+                ).fetchone()
+            if linha is None or time.time() - linha[1] >= self.idade_maxima:
+                return None
+            return json.loads(linha[0]), linha[1], linha[2], linha[3], linha[4]
+        except Exception as e:
+            logger.error(f"Erro ao ler cache em disco: {e}")
+            return None
+
+    def salvar(self, chave, data, latitude, longitude, timestamp, perfil=PERFIL_COMPLETO):
+        """Grava (ou substitui) o payload da área, buscado com `perfil`"""
+        try:
+            payload = json.dumps(data, ensure_ascii=False)
+            with self._lock:
+                conexao = self._conectar()
+                conexao.execute(
+                    "INSERT OR REPLACE INTO previsoes VALUES (?, ?, ?, ?, ?, ?)",
+                    (chave, latitude, longitude, timestamp, payload, perfil)
+                )
+                conexao.commit()
+        except Exception as e:
+            logger.error(f"Erro ao gravar cache em disco: {e}")
+
+    def salvar_lote(self, registros, timestamp, perfil=PERFIL_COMPLETO):
+        """Grava vários payloads [(chave, data, latitude, longitude)] em uma transação"""
+        try:
+            linhas = [
+                (chave, latitude, longitude, timestamp, json.dumps(data, ensure_ascii=False), perfil)
+                for chave, data, latitude, longitude in registros
+            ]
+            with self._lock:
+                conexao = self._conectar()
+                conexao.executemany("INSERT OR REPLACE INTO previsoes VALUES (?, ?, ?, ?, ?, ?)", linhas)
+                conexao.commit()
+        except Exception as e:
+            logger.error(f"Erro ao gravar cache em disco: {e}")
+
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
@@ -0,0 +1,96 @@
+import math
+import re
+from config import DRONE_CONFIG, FLIGHT_LIMITS, DRONE_MAX_WINDOWS, DRONE_MAX_PROFILES, alert_state
+
+# Campos de um perfil de drone informados pelo usuário, em ordem
+CAMPOS_PERFIL = ('max_wind_resistance', 'min_temp_operation', 'max_temp_operation', 'bateria_duracao')
+
+# Nomes aceitos para perfis (sem caracteres especiais do Markdown)
+NOME_PERFIL = re.compile(r'^[A-Za-z0-9-]{1,20}$')
+
+def limites_do_perfil(perfil):
+    """
+    Combina os limites de segurança de voo com as especificações do drone
+    """
+    return {
+        'max_vento': min(FLIGHT_LIMITS['max_wind'], perfil['max_wind_resistance']),
+        'max_rajada': perfil['max_wind_resistance'],
+        'min_visibilidade': FLIGHT_LIMITS['min_visibility'],
+        'max_chuva': FLIGHT_LIMITS['max_rain_chance'],
+        'min_temp': max(FLIGHT_LIMITS['min_temp'], perfil['min_temp_operation']),
+        'max_temp': min(FLIGHT_LIMITS['max_temp'], perfil['max_temp_operation'])
+    }
+
+def horas_seguras(previsao, limites, inicio=0):
+    """
+    Avalia todas as horas a partir de `inicio` em uma única passada pelas
+    colunas da previsão. Retorna uma lista de booleanos
+    """
+    return [
+        vento <= limites['max_vento'] and rajada <= limites['max_rajada']
+        and visibilidade >= limites['min_visibilidade'] and chuva <= limites['max_chuva']
+        and limites['min_temp'] <= temp <= limites['max_temp']
+        for vento, rajada, visibilidade, chuva, temp in zip(
+            previsao.wind_kph[inicio:], previsao.gust_kph[inicio:], previsao.vis_km[inicio:],
+            previsao.chance_of_rain[inicio:], previsao.temp_c[inicio:]
+        )
+    ]
+
+def planejar_janelas(previsao, perfil, inicio=None, max_janelas=DRONE_MAX_WINDOWS):
+    """
+    Retorna as janelas contínuas seguras a partir de `inicio` (padrão: agora)
+    com duração suficiente para ao menos uma bateria, ordenadas da mais longa
+    para a mais curta (e da mais cedo para a mais tarde em caso de empate).
+    Cada janela é {'inicio', 'fim', 'horas', 'voos'} com índices da previsão
+    """
+    if inicio is None:
+        inicio = previsao.indice_agora()
+    if inicio is None:
+        return []
+
+    minimo_horas = math.ceil(perfil['bateria_duracao'] / 60)
+    seguras = horas_seguras(previsao, limites_do_perfil(perfil), inicio)
+
+    janelas = []
+    comeco = None
+    for deslocamento, segura in enumerate(seguras + [False]):
+        if segura and comeco is None:
+            comeco = deslocamento
+        elif not segura and comeco is not None:
+            horas = deslocamento - comeco
+            if horas >= minimo_horas:
+                janelas.append({
+                    'inicio': inicio + comeco,
+                    'fim': inicio + deslocamento,
+                    'horas': horas,
+                    'voos': horas * 60 // perfil['bateria_duracao']
+                })
+            comeco = None
+
+    janelas.sort(key=lambda j: (-j['horas'], j['inicio']))
+    return janelas[:max_janelas]
+
+def perfis_do_chat(chat_id):
+    """Perfil padrão (DRONE_CONFIG) mais os perfis personalizados do chat"""
+    return {DRONE_CONFIG['modelo']: DRONE_CONFIG, **alert_state['drone_locations'].get(chat_id, {})}
+
+def salvar_perfil(chat_id, nome, valores):
+    """
+    Cria ou substitui um perfil do chat a partir dos valores de CAMPOS_PERFIL.
+    Retorna (sucesso, mensagem)
+    """
+    if not NOME_PERFIL.match(nome):
+        return False, "Use no nome do perfil apenas letras, números e hífen (até 20 caracteres)"
+    perfis = alert_state['drone_locations'].setdefault(chat_id, {})
+    if nome not in perfis and len(perfis) >= DRONE_MAX_PROFILES:
+        return False, f"Limite de {DRONE_MAX_PROFILES} perfis atingido"
+
+    perfil = {'modelo': nome, **dict(zip(CAMPOS_PERFIL, valores))}
+    if perfil['bateria_duracao'] <= 0 or perfil['min_temp_operation'] > perfil['max_temp_operation']:
+        return False, "Valores inválidos para o perfil"
+    perfis[nome] = perfil
+    return True, f"Perfil {nome} salvo"
+
+def remover_perfil(chat_id, nome):
+    """Remove um perfil personalizado do chat"""
+    return alert_state['drone_locations'].get(chat_id, {}).pop(nome, None) is not None
@@ -0,0 +1,152 @@
+import time
+from array import array
+from bisect import bisect_right
+from itertools import count
+from config import FETCH_PROFILES
+
+# Versões sequenciais das previsões processadas
+_versoes = count(1)
+
+HORA = 3600  # segundos
+
+# Perfis de busca em ordem crescente de conteúdo
+PERFIS = tuple(FETCH_PROFILES)
+PERFIL_COMPLETO = PERFIS[-1]
+
+def perfil_atende(disponivel, pedido):
+    """Se uma previsão buscada com o perfil `disponivel` atende a um pedido do perfil `pedido`"""
+    return PERFIS.index(disponivel) >= PERFIS.index(pedido)
+
+class PrevisaoTempo:
+    """
+    Previsão processada uma única vez por busca: dados atuais e resumo diário
+    como dicionários e as horas de todos os dias em uma única linha do tempo
+    de colunas (arrays), indexada por epoch, com consultas O(1) de "agora" e
+    de máximos/somas em janelas das próximas N horas.
+    """
+    __slots__ = (
+        'versao', 'perfil', 'local', 'atual', 'dias', 'inicio_dia',
+        'time_epoch', 'dia', 'hora', 'chance_of_rain', 'precip_mm',
+        'wind_kph', 'gust_kph', 'vis_km', 'temp_c',
+        'soma_precip', '_passo_uniforme', '_tabelas'
+    )
+
+    def __init__(self, payload, perfil=PERFIL_COMPLETO):
+        self.versao = next(_versoes)
+        self.perfil = perfil
+        self.local = payload.get('location', {})
+        self.atual = payload['current']
+        self.dias = []
+        self.inicio_dia = array('H')
+
+        self.time_epoch = array('q')
+        self.dia = array('B')
+        self.hora = array('B')
+        self.chance_of_rain = array('B')
+        self.precip_mm = array('d')
+        self.wind_kph = array('d')
+        self.gust_kph = array('d')
+        self.vis_km = array('d')
+        self.temp_c = array('d')
+
+        for indice_dia, dia in enumerate(payload.get('forecast', {}).get('forecastday', [])):
+            self.dias.append({'date': dia['date'], 'day': dia['day']})
+            self.inicio_dia.append(len(self.time_epoch))
+            for hora in dia.get('hour', []):
+                self.time_epoch.append(int(hora.get('time_epoch', 0)))
+                self.dia.append(indice_dia)
+                self.hora.append(int(hora['time'].split(' ')[1].split(':')[0]))
+                self.chance_of_rain.append(int(hora.get('chance_of_rain', 0)))
+                self.precip_mm.append(hora.get('precip_mm', 0))
+                self.wind_kph.append(hora.get('wind_kph', 0))
+                self.gust_kph.append(hora.get('gust_kph', hora.get('wind_kph', 0)))
+                self.vis_km.append(hora.get('vis_km', 0))
+                self.temp_c.append(hora.get('temp_c', 0))
+
+        self._calcular_agregados()
+
+    def _calcular_agregados(self):
+        """Pré-calcula somas acumuladas e verifica o passo da linha do tempo"""
+        # Soma acumulada da precipitação (soma_precip[j] - soma_precip[i] = total em [i, j))
+        self.soma_precip = array('d', [0.0])
+        for valor in self.precip_mm:
+            self.soma_precip.append(self.soma_precip[-1] + valor)
+
+        total = len(self.time_epoch)
+        self._passo_uniforme = total > 0 and (
+            self.time_epoch[-1] - self.time_epoch[0] == HORA * (total - 1)
+        )
+        # Tabelas esparsas de máximo/mínimo, criadas sob demanda por coluna
+        self._tabelas = {}
+
+    def __len__(self):
+        return len(self.time_epoch)
+
+    def indice_em(self, epoch):
+        """Índice da hora que contém o instante `epoch`, ou None"""
+        if not len(self) or epoch < self.time_epoch[0]:
+            return None
+        if self._passo_uniforme:
+            i = int(epoch - self.time_epoch[0]) // HORA
+        else:
+            i = bisect_right(self.time_epoch, epoch) - 1
+        return i if i < len(self) and epoch < self.time_epoch[i] + HORA else None
+
+    def indice_agora(self):
+        """Índice da hora atual na linha do tempo, ou None"""
+        return self.indice_em(time.time())
+
+    def janela(self, inicio, horas):
+        """Limites [inicio, fim) das próximas `horas` horas dentro da previsão"""
+        return inicio, min(inicio + horas, len(self))
+
+    def _tabela(self, nome, funcao):
+        chave = (nome, funcao)
+        niveis = self._tabelas.get(chave)
+        if niveis is None:
+            coluna = getattr(self, nome)
+            niveis = [coluna]
+            passo = 1
+            while 2 * passo <= len(coluna):
+                anterior = niveis[-1]
+                niveis.append(array(coluna.typecode, (
+                    funcao(anterior[i], anterior[i + passo])
+                    for i in range(len(anterior) - passo)
+                )))
+                passo *= 2
+            self._tabelas[chave] = niveis
+        return niveis
+
+    def _consultar(self, nome, funcao, inicio, horas):
+        inicio, fim = self.janela(inicio, horas)
+        if fim <= inicio:
+            return None
+        nivel = (fim - inicio).bit_length() - 1
+        tabela = self._tabela(nome, funcao)[nivel]
+        return funcao(tabela[inicio], tabela[fim - (1 << nivel)])
+
+    def maximo(self, nome, inicio, horas):
+        """Máximo da coluna `nome` nas próximas `horas` horas a partir de `inicio` (O(1))"""
+        return self._consultar(nome, max, inicio, horas)
+
+    def minimo(self, nome, inicio, horas):
+        """Mínimo da coluna `nome` nas próximas `horas` horas a partir de `inicio` (O(1))"""
+        return self._consultar(nome, min, inicio, horas)
+
+    def precipitacao_total(self, inicio, horas):
+        """Precipitação somada nas próximas `horas` horas a partir de `inicio` (O(1))"""
+        inicio, fim = self.janela(inicio, horas)
+        return self.soma_precip[max(fim, inicio)] - self.soma_precip[inicio]
+
+    def horario(self, i, com_data=False):
+        """Horário da coluna i no formato HH:MM (ou DD/MM HH:MM)"""
+        if com_data:
+            _, mes, dia = self.dias[self.dia[i]]['date'].split('-')
+            return f"{dia}/{mes} {self.hora[i]:02d}:00"
+        return f"{self.hora[i]:02d}:00"
+
+def processar_previsao(payload, perfil=PERFIL_COMPLETO):
+    """
+    Converte o payload da API (buscado com `perfil`) no modelo colunar
+    """
+    return PrevisaoTempo(payload, perfil)
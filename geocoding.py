@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import httpx
+from config import (logger, VIACEP_URL, NOMINATIM_URL, GEOCODING_CACHE_DAYS,
+                    NOMINATIM_MAX_CONCURRENT, NOMINATIM_MIN_INTERVAL, CEP_INDEX_PATH)
+from cache import TTLCache
+from http_client import obter_cliente_async
+
+# Caches de longa duração: CEP -> localidade e localidade -> coordenadas
+_cache_cep = TTLCache(GEOCODING_CACHE_DAYS * 24 * 60, max_entradas=4096)
+_cache_coordenadas = TTLCache(GEOCODING_CACHE_DAYS * 24 * 60, max_entradas=4096)
+
+# Limita as requisições ao Nominatim (máx. 1 por segundo)
+_semaforo_nominatim = asyncio.Semaphore(NOMINATIM_MAX_CONCURRENT)
+_ultima_requisicao_nominatim = 0.0
+
+class IndicePrefixoCEP:
+    """
+    Índice local de prefixos de CEP (5 primeiros dígitos) para localidade e
+    coordenadas, alimentado pelas consultas já resolvidas. CEPs repetidos ou
+    vizinhos são resolvidos sem chamadas de rede.
+    """
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.prefixos = None
+        self.versao = 0
+        self._versao_gravada = 0
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        if self.prefixos is None:
+            self.prefixos = {}
+            try:
+                if os.path.exists(self.caminho):
+                    with open(self.caminho, 'r', encoding='utf-8') as f:
+                        self.prefixos = json.load(f)
+            except Exception as e:
+                logger.error(f"Erro ao carregar índice de CEP: {e}")
+        return self.prefixos
+
+    def buscar(self, cep):
+        """Retorna a localidade conhecida para o prefixo do CEP, ou None"""
+        return self._carregar().get(cep[:5])
+
+    def registrar(self, cep, localidade):
+        """Registra a localidade do prefixo; retorna True se o índice mudou"""
+        prefixos = self._carregar()
+        if prefixos.get(cep[:5]) == localidade:
+            return False
+        prefixos[cep[:5]] = localidade
+        self.versao += 1
+        return True
+
+    def copia(self):
+        """Retorna (cópia do índice, versão) para gravar fora do loop de eventos"""
+        return dict(self._carregar()), self.versao
+
+    def salvar(self, dados, versao):
+        """
+        Grava no arquivo uma cópia do índice; cópias mais antigas que a
+        última gravada são ignoradas
+        """
+        with self._lock:
+            if versao <= self._versao_gravada:
+                return
+            try:
+                with open(self.caminho, 'w', encoding='utf-8') as f:
+                    json.dump(dados, f, ensure_ascii=False)
+                self._versao_gravada = versao
+            except Exception as e:
+                logger.error(f"Erro ao salvar índice de CEP: {e}")
+
+indice_cep = IndicePrefixoCEP(CEP_INDEX_PATH) if CEP_INDEX_PATH else None
+
+def normalizar_cep(cep):
+    """Retorna o CEP com 8 dígitos, ou None se inválido"""
+    digitos = re.sub(r'\D', '', cep or '')
+    return digitos if len(digitos) == 8 else None
+
+async def buscar_cep(cep):
+    """
+    Consulta a localidade do CEP no ViaCEP (com cache).
+    Retorna {'cidade', 'estado'} ou None se o CEP não existir
+    """
+    localidade = _cache_cep.obter(cep)
+    if localidade is not None:
+        return localidade
+
+    response = await obter_cliente_async().get(f"{VIACEP_URL}/{cep}/json/")
+    response.raise_for_status()
+    data = response.json()
+    if 'erro' in data:
+        return None
+
+    localidade = {'cidade': data['localidade'], 'estado': data['uf']}
+    _cache_cep.definir(cep, localidade)
+    return localidade
+
+async def buscar_coordenadas(cidade, estado):
+    """
+    Consulta as coordenadas da localidade no Nominatim (com cache e
+    respeitando o limite de requisições). Retorna (latitude, longitude) ou None
+    """
+    global _ultima_requisicao_nominatim
+    chave = f"{cidade}/{estado}".lower()
+    coordenadas = _cache_coordenadas.obter(chave)
+    if coordenadas is not None:
+        return coordenadas
+
+    async with _semaforo_nominatim:
+        # Outra tarefa pode ter resolvido a mesma localidade enquanto aguardávamos
+        coordenadas = _cache_coordenadas.obter(chave)
+        if coordenadas is not None:
+            return coordenadas
+
+        espera = _ultima_requisicao_nominatim + NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        try:
+            response = await obter_cliente_async().get(
+                NOMINATIM_URL,
+                params={'city': cidade, 'state': estado, 'country': 'Brazil', 'format': 'json'},
+                headers={'User-Agent': 'WeatherBot/1.0'}
+            )
+        finally:
+            _ultima_requisicao_nominatim = time.monotonic()
+
+    if response.status_code != 200:
+        logger.error(f"Erro no Nominatim: {response.status_code}")
+        return None
+    geo_data = response.json()
+    if not geo_data:
+        return None
+
+    coordenadas = (float(geo_data[0]['lat']), float(geo_data[0]['lon']))
+    _cache_coordenadas.definir(chave, coordenadas)
+    return coordenadas
+
+async def geocodificar_cep(cep):
+    """
+    Resolve o CEP em localidade e coordenadas.
+    Retorna (resultado, erro); latitude/longitude podem ser None se a
+    localidade não for encontrada no Nominatim
+    """
+    cep_normalizado = normalizar_cep(cep)
+    if not cep_normalizado:
+        return None, "CEP inválido"
+
+    if indice_cep is not None:
+        conhecido = indice_cep.buscar(cep_normalizado)
+        if conhecido is not None:
+            logger.info(f"CEP {cep_normalizado} resolvido pelo índice local")
+            return dict(conhecido), None
+
+    try:
+        localidade = await buscar_cep(cep_normalizado)
+        if localidade is None:
+            return None, "CEP não encontrado"
+        coordenadas = await buscar_coordenadas(localidade['cidade'], localidade['estado'])
+    except httpx.HTTPError as e:
+        logger.error(f"Erro ao geocodificar CEP {cep_normalizado}: {e}")
+        return None, "Erro ao buscar CEP"
+
+    latitude, longitude = coordenadas if coordenadas else (None, None)
+    resultado = {**localidade, 'latitude': latitude, 'longitude': longitude}
+
+    if coordenadas and indice_cep is not None and indice_cep.registrar(cep_normalizado, resultado):
+        # A cópia é tirada no loop: o registrar de outras consultas altera o índice em paralelo
+        await asyncio.to_thread(indice_cep.salvar, *indice_cep.copia())
+    return resultado, None
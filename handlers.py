@@ -1,20 +1,35 @@
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from config import CIDADE_NOME, alert_state, LATITUDE, LONGITUDE, DRONE_CONFIG, FLIGHT_LIMITS
-from weather import obter_previsao_tempo, formatar_condicao_tempo, obter_emoji_tempo
+from telegram.helpers import escape_markdown
+from config import (CIDADE_NOME, LATITUDE, LONGITUDE, DRONE_CONFIG, FLIGHT_LIMITS,
+                    RAIN_HORIZONS, RAIN_HORIZON_DEFAULT, LONA_HORIZON_DEFAULT)
+from weather import obter_previsao_tempo_async, formatar_condicao_tempo, obter_emoji_tempo
 from utils import enviar_resposta, criar_menu_voltar, criar_menu_principal
 from user_config import user_config
+from cache import forecast_cache, render_cache
+from subscribers import subscriber_registry
+from drone_planner import planejar_janelas, perfis_do_chat, salvar_perfil, remover_perfil, CAMPOS_PERFIL
+
+def _renderizar(location, previsao, tela, montar, *variante):
+    """
+    Retorna a mensagem da tela a partir do cache de renderização,
+    montando-a apenas uma vez por área, versão da previsão e local exibido
+    """
+    chave = forecast_cache.chave(location['latitude'], location['longitude'])
+    variante = (location['cidade'], location['estado']) + variante
+    return render_cache.obter_ou_montar(chave, previsao.versao, tela, variante, montar)
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /start"""
-    user_id = update.effective_user.id
-    alert_state['users_subscribed'].add(user_id)
+    chat_id = update.effective_chat.id
+    location = user_config.get_location(chat_id)
+    await subscriber_registry.inscrever(chat_id, location['latitude'], location['longitude'])
     await show_main_menu(update.message)
 
 async def show_main_menu(message_obj):
     """Mostra o menu principal"""
-    location = user_config.get_location()
+    location = user_config.get_location(message_obj.chat_id)
     
     mensagem = f"""
 🤖 **Bot de Previsão do Tempo - {location['cidade']}/{location['estado']}**
@@ -52,76 +67,99 @@ Selecione uma opção abaixo! 👇
     
     await message_obj.reply_text(mensagem, reply_markup=reply_markup, parse_mode='Markdown')
 
+def _horizonte(context, padrao):
+    """Horizonte em horas informado no comando (ex.: /chuva 24), se permitido"""
+    if context.args and context.args[0].isdigit() and int(context.args[0]) in RAIN_HORIZONS:
+        return int(context.args[0])
+    return padrao
+
 async def chance_chuva_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback para chance de chuva"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'curto')
     
     if not previsao:
         await enviar_resposta(update, "❌ Não foi possível obter previsão de chuva.", criar_menu_voltar())
         return
     
-    hoje = previsao["forecast"]["forecastday"][0]
-    horas = hoje["hour"]
-    agora = datetime.now().hour
-    
-    mensagem = f"🌧️ **PREVISÃO DE CHUVA - PRÓXIMAS 6 HORAS**\n\n"
-    
-    for i in range(6):
-        hora_index = (agora + i) % 24
-        if hora_index < len(horas):
-            hora_data = horas[hora_index]
-            time_str = hora_data["time"].split(" ")[1]
-            chance = hora_data.get("chance_of_rain", 0)
-            precipitacao = hora_data.get("precip_mm", 0)
-            
-            emoji = "⛈️" if chance >= 70 else "🌧️" if chance >= 30 else "☁️"
-            mensagem += f"{emoji} **{time_str}** - {chance}% "
-            if precipitacao > 0:
-                mensagem += f"({precipitacao}mm)"
-            mensagem += "\n"
+    agora = previsao.indice_agora()
+    if agora is None:
+        await enviar_resposta(update, "❌ Não foi possível obter previsão de chuva.", criar_menu_voltar())
+        return
+    
+    horas = _horizonte(context, RAIN_HORIZON_DEFAULT)
+    passo = 1 if horas <= 12 else 3  # horizontes longos agrupados em blocos de 3 horas
+    inicio, fim = previsao.janela(agora, horas)
+    com_data = previsao.dia[fim - 1] != previsao.dia[inicio]
+    
+    mensagem = f"🌧️ **PREVISÃO DE CHUVA - PRÓXIMAS {horas} HORAS**\n\n"
+    
+    for hora_index in range(inicio, fim, passo):
+        time_str = previsao.horario(hora_index, com_data)
+        chance = previsao.maximo('chance_of_rain', hora_index, passo)
+        precipitacao = round(previsao.precipitacao_total(hora_index, passo), 2)
+        
+        emoji = "⛈️" if chance >= 70 else "🌧️" if chance >= 30 else "☁️"
+        mensagem += f"{emoji} **{time_str}** - {chance}% "
+        if precipitacao > 0:
+            mensagem += f"({precipitacao}mm)"
+        mensagem += "\n"
+    
+    max_chance = previsao.maximo('chance_of_rain', inicio, horas)
+    total = previsao.precipitacao_total(inicio, horas)
+    mensagem += f"\n📈 Máxima: {max_chance}% • 💧 Total previsto: {total:.1f}mm\n"
+    mensagem += f"_Outros períodos: {', '.join(f'/chuva {h}' for h in RAIN_HORIZONS if h != horas)}_\n"
     
     await enviar_resposta(update, mensagem, criar_menu_voltar())
 
 async def proximos_dias_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback para próximos dias"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'curto')
     
     if not previsao:
         await enviar_resposta(update, "❌ Não foi possível obter previsão dos próximos dias.", criar_menu_voltar())
         return
     
-    dias = previsao["forecast"]["forecastday"]
-    mensagem = f"📅 **PREVISÃO PARA OS PRÓXIMOS DIAS - {location['cidade']}/{location['estado']}**\n\n"
+    def montar():
+        dias = previsao.dias
+        mensagem = f"📅 **PREVISÃO PARA OS PRÓXIMOS DIAS - {location['cidade']}/{location['estado']}**\n\n"
     
-    for i, dia in enumerate(dias[:3]):  # Mostra apenas 3 dias
-        data = datetime.strptime(dia["date"], "%Y-%m-%d")
-        nome_dia = "Hoje" if i == 0 else "Amanhã" if i == 1 else data.strftime("%A")
+        for i, dia in enumerate(dias[:3]):  # Mostra apenas 3 dias
+            data = datetime.strptime(dia["date"], "%Y-%m-%d")
+            nome_dia = "Hoje" if i == 0 else "Amanhã" if i == 1 else data.strftime("%A")
         
-        day = dia["day"]
-        condicao = formatar_condicao_tempo(day["condition"]["text"])
-        emoji = obter_emoji_tempo(day["condition"]["text"])
+            day = dia["day"]
+            condicao = formatar_condicao_tempo(day["condition"]["text"])
+            emoji = obter_emoji_tempo(day["condition"]["text"])
         
-        mensagem += f"{emoji} **{nome_dia}**\n"
-        mensagem += f"🌡️ {day['mintemp_c']}°C - {day['maxtemp_c']}°C\n"
-        mensagem += f"🌧️ Chuva: {day.get('daily_chance_of_rain', 0)}%\n"
-        mensagem += f"💨 Vento: {day['maxwind_kph']} km/h\n\n"
+            mensagem += f"{emoji} **{nome_dia}**\n"
+            mensagem += f"🌡️ {day['mintemp_c']}°C - {day['maxtemp_c']}°C\n"
+            mensagem += f"🌧️ Chuva: {day.get('daily_chance_of_rain', 0)}%\n"
+            mensagem += f"💨 Vento: {day['maxwind_kph']} km/h\n\n"
+        return mensagem
+    
+    mensagem = _renderizar(location, previsao, 'proximos_dias', montar)
     
     await enviar_resposta(update, mensagem, criar_menu_voltar())
 
 async def status_lona_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback para status da lona"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'curto')
     
     if not previsao:
         await enviar_resposta(update, "❌ Não foi possível verificar status da lona.", criar_menu_voltar())
         return
     
-    hoje = previsao["forecast"]["forecastday"][0]
-    proximas_horas = hoje["hour"][datetime.now().hour:]
-    max_chance = max(hora.get("chance_of_rain", 0) for hora in proximas_horas)
+    agora = previsao.indice_agora()
+    horas = _horizonte(context, LONA_HORIZON_DEFAULT)
+    if agora is not None:
+        inicio, fim = previsao.janela(agora, horas)
+        max_chance = previsao.maximo('chance_of_rain', inicio, horas)
+        horas_restantes = fim - inicio
+    else:
+        max_chance, horas_restantes = 0, 0
     
     mensagem = f"""
 🏠 **STATUS DA LONA - {location['cidade']}/{location['estado']}**
@@ -130,7 +168,7 @@ async def status_lona_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 
 **Previsão:**
 • Chance máxima de chuva: {max_chance}%
-• Período: Próximas {len(proximas_horas)} horas
+• Período: Próximas {horas_restantes} horas
 
 **Recomendação:**
 {'⚠️ Baixe a lona para evitar danos!' if max_chance >= 70 else '✅ Não há necessidade de baixar a lona no momento.'}
@@ -144,21 +182,22 @@ async def clima_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def clima_atual_detalhado(update_obj, context):
     """Mostra informações detalhadas do clima atual"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update_obj.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'atual')
     
     if not previsao:
         await enviar_resposta(update_obj, "❌ Não foi possível obter dados meteorológicos no momento.", criar_menu_voltar())
         return
     
-    current = previsao["current"]
+    def montar():
+        current = previsao.atual
     
-    temperatura = current["temp_c"]
-    sensacao = current["feelslike_c"]
-    condicao = formatar_condicao_tempo(current["condition"]["text"])
-    emoji = obter_emoji_tempo(current["condition"]["text"])
+        temperatura = current["temp_c"]
+        sensacao = current["feelslike_c"]
+        condicao = formatar_condicao_tempo(current["condition"]["text"])
+        emoji = obter_emoji_tempo(current["condition"]["text"])
     
-    mensagem = f"""
+        mensagem = f"""
 {emoji} **CLIMA ATUAL - {location['cidade']}/{location['estado']}**
 
 🌡️ **Temperatura:** {temperatura}°C
@@ -172,6 +211,9 @@ async def clima_atual_detalhado(update_obj, context):
 📍 **Localização:** {location['cidade']}, {location['estado']}
 🕐 **Última atualização:** {current['last_updated']}
 """
+        return mensagem
+    
+    mensagem = _renderizar(location, previsao, 'clima_atual', montar)
     
     await enviar_resposta(update_obj, mensagem, criar_menu_voltar())
 
@@ -181,41 +223,106 @@ async def drone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def status_voo_drone(update_obj, context):
     """Status para voo do drone"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update_obj.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'completo')
     
     if not previsao:
         await enviar_resposta(update_obj, "❌ Não foi possível verificar condições de voo.", criar_menu_voltar())
         return
     
-    current = previsao["current"]
+    momento = datetime.now().strftime('%d/%m/%Y %H:%M')
+    agora = previsao.indice_agora()
     
-    vento_ok = current['wind_kph'] <= FLIGHT_LIMITS['max_wind']
-    visibilidade_ok = current['vis_km'] >= FLIGHT_LIMITS['min_visibility']
-    temp_ok = FLIGHT_LIMITS['min_temp'] <= current['temp_c'] <= FLIGHT_LIMITS['max_temp']
+    def montar():
+        current = previsao.atual
+        chance_chuva = previsao.chance_of_rain[agora] if agora is not None else 0
+        rajada = current.get('gust_kph', current['wind_kph'])
     
-    is_safe = vento_ok and visibilidade_ok and temp_ok
+        vento_ok = current['wind_kph'] <= FLIGHT_LIMITS['max_wind'] and rajada <= DRONE_CONFIG['max_wind_resistance']
+        visibilidade_ok = current['vis_km'] >= FLIGHT_LIMITS['min_visibility']
+        temp_ok = FLIGHT_LIMITS['min_temp'] <= current['temp_c'] <= FLIGHT_LIMITS['max_temp']
+        chuva_ok = chance_chuva <= FLIGHT_LIMITS['max_rain_chance']
     
-    mensagem = f"""
-🚁 **STATUS PARA VOO - DJI Mini 2**
-📍 Local: {location['cidade']}/{location['estado']}
-{datetime.now().strftime('%d/%m/%Y %H:%M')}
-
+        is_safe = vento_ok and visibilidade_ok and temp_ok and chuva_ok
+    
+        mensagem = f"""
 **Status Geral:** {"✅ SEGURO PARA VOO" if is_safe else "❌ NÃO RECOMENDADO"}
 
 **Condições Atuais:**
-• {"✅" if vento_ok else "❌"} Vento: {current['wind_kph']} km/h
+• {"✅" if vento_ok else "❌"} Vento: {current['wind_kph']} km/h (rajadas {rajada} km/h)
 • {"✅" if visibilidade_ok else "❌"} Visibilidade: {current['vis_km']} km
 • {"✅" if temp_ok else "❌"} Temperatura: {current['temp_c']}°C
+• {"✅" if chuva_ok else "❌"} Chance de chuva: {chance_chuva}%
 
 📋 **Especificações do Drone:**
 • Peso: {DRONE_CONFIG['peso']}g
 • Altitude máxima: {DRONE_CONFIG['max_altitude']}m
 • Autonomia: ~{DRONE_CONFIG['bateria_duracao']} minutos
+
+🗓️ **JANELAS SEGURAS (PRÓXIMOS DIAS):**
 """
+        for nome, perfil in perfis.items():
+            mensagem += f"\n*{escape_markdown(nome)}*\n"
+            janelas = planejar_janelas(previsao, perfil, agora)
+            if not janelas:
+                mensagem += "• Nenhuma janela segura na previsão\n"
+            for janela in janelas:
+                mensagem += (f"• {previsao.horario(janela['inicio'], True)} - "
+                             f"{janela['horas']}h (~{janela['voos']} voo(s))\n")
+        mensagem += "\n_Cadastre outros drones com /droneperfil_\n"
+        return mensagem
+    
+    perfis = perfis_do_chat(update_obj.effective_chat.id)
+    assinatura_perfis = tuple((nome, tuple(sorted(p.items()))) for nome, p in perfis.items())
+    # O corpo muda com a hora da previsão; o horário exibido fica fora do cache
+    corpo = _renderizar(location, previsao, 'status_drone', montar, agora, assinatura_perfis)
+    mensagem = f"""
+🚁 **STATUS PARA VOO - DJI Mini 2**
+📍 Local: {location['cidade']}/{location['estado']}
+{momento}
+{corpo}"""
     
     await enviar_resposta(update_obj, mensagem, criar_menu_voltar())
 
+async def drone_perfil_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /droneperfil - Gerencia os perfis de drone do chat"""
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    
+    if len(args) == 2 and args[0] == 'remover':
+        removido = remover_perfil(chat_id, args[1])
+        nome = escape_markdown(args[1])
+        mensagem = f"✅ Perfil {nome} removido" if removido else f"❌ Perfil {nome} não encontrado"
+    elif len(args) == 1 + len(CAMPOS_PERFIL):
+        try:
+            valores = [int(valor) for valor in args[1:]]
+        except ValueError:
+            valores = None
+        if valores is None:
+            mensagem = "❌ Use apenas números inteiros nos valores do perfil"
+        else:
+            sucesso, texto = salvar_perfil(chat_id, args[0], valores)
+            mensagem = f"{'✅' if sucesso else '❌'} {texto}"
+    else:
+        linhas = [
+            f"• *{escape_markdown(nome)}*: vento até {p['max_wind_resistance']} km/h, "
+            f"{p['min_temp_operation']}°C a {p['max_temp_operation']}°C, {p['bateria_duracao']} min"
+            for nome, p in perfis_do_chat(chat_id).items()
+        ]
+        mensagem = f"""
+🚁 **PERFIS DE DRONE**
+
+{chr(10).join(linhas)}
+
+Para cadastrar ou alterar um perfil:
+`/droneperfil nome vento temp_min temp_max bateria`
+Exemplo: `/droneperfil Mavic3 43 -10 40 46`
+
+Para remover: `/droneperfil remover nome`
+"""
+    
+    await enviar_resposta(update, mensagem, criar_menu_voltar())
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /help"""
     mensagem = """
@@ -230,7 +337,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 🌧️ **/chuva**
 • Previsão de chuva
-• Próximas horas
+• Próximas horas (`/chuva 6`, `12`, `24` ou `48`)
 • Recomendações
 
 📅 **/diasdechuva**
@@ -239,14 +346,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Tendências
 
 🏠 **/baixarlona**
-• Status da lona
+• Status da lona (`/baixarlona 24` para outro período)
 • Recomendações
 • Alertas
 
 🚁 **/drone**
 • Condições para voo
-• Status do clima
-• Recomendações
+• Janelas seguras nos próximos dias
+• Perfis de drone com /droneperfil
 
 🔔 **/alertas**
 • Configurar notificações
@@ -263,7 +370,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def config_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /config"""
-    location = user_config.get_location()
+    location = user_config.get_location(update.effective_chat.id)
     
     keyboard = [
         [InlineKeyboardButton("🔄 Atualizar CEP", callback_data='update_cep')],
@@ -302,10 +409,13 @@ async def cep_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         
         cep = context.args[0]
-        success, message = user_config.update_location(cep)
+        success, message = await user_config.update_location(cep, update.effective_chat.id)
         
         if success:
-            location = user_config.get_location()
+            location = user_config.get_location(update.effective_chat.id)
+            await subscriber_registry.atualizar_local(
+                update.effective_chat.id, location['latitude'], location['longitude']
+            )
             mensagem = f"""
 ✅ **Localização atualizada!**
 
@@ -331,7 +441,7 @@ Use /clima para ver a previsão do tempo para sua nova localização!
 
 async def show_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mostra a localização atual configurada"""
-    location = user_config.get_location()
+    location = user_config.get_location(update.effective_chat.id)
     
     mensagem = f"""
 📍 **LOCALIZAÇÃO ATUAL**
@@ -360,8 +470,7 @@ async def dias_chuva_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def alertas_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /alertas - Configuração de alertas"""
-    user_id = update.effective_user.id
-    is_subscribed = user_id in alert_state['users_subscribed']
+    is_subscribed = subscriber_registry.inscrito(update.effective_chat.id)
     
     keyboard = [
         [InlineKeyboardButton(
@@ -392,45 +501,47 @@ Alertas são enviados:
 
 async def toggle_alertas_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Callback para ativar/desativar alertas"""
-    user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
     
-    if user_id in alert_state['users_subscribed']:
-        alert_state['users_subscribed'].remove(user_id)
+    if subscriber_registry.inscrito(chat_id):
+        await subscriber_registry.remover(chat_id)
         status = "desativados"
     else:
-        alert_state['users_subscribed'].add(user_id)
+        location = user_config.get_location(chat_id)
+        await subscriber_registry.inscrever(chat_id, location['latitude'], location['longitude'])
         status = "ativados"
     
     await alertas_command(update, context)
 
 async def relatorio_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /relatorio - Relatório completo"""
-    location = user_config.get_location()
-    previsao = obter_previsao_tempo(location['latitude'], location['longitude'])
+    location = user_config.get_location(update.effective_chat.id)
+    previsao = await obter_previsao_tempo_async(location['latitude'], location['longitude'], 'curto')
     
     if not previsao:
         await enviar_resposta(update, "❌ Não foi possível obter os dados meteorológicos.", criar_menu_voltar())
         return
     
-    current = previsao["current"]
-    forecast = previsao["forecast"]["forecastday"][0]
-    
-    # Condições atuais
-    temp_atual = current["temp_c"]
-    sensacao = current["feelslike_c"]
-    umidade = current["humidity"]
-    vento = current["wind_kph"]
-    direcao_vento = current["wind_dir"]
-    condicao = formatar_condicao_tempo(current["condition"]["text"])
-    emoji = obter_emoji_tempo(current["condition"]["text"])
-    
-    # Previsão para hoje
-    max_temp = forecast["day"]["maxtemp_c"]
-    min_temp = forecast["day"]["mintemp_c"]
-    chance_chuva = forecast["day"]["daily_chance_of_rain"]
-    precipitacao = forecast["day"]["totalprecip_mm"]
-    
-    mensagem = f"""
+    def montar():
+        current = previsao.atual
+        forecast = previsao.dias[0]
+    
+        # Condições atuais
+        temp_atual = current["temp_c"]
+        sensacao = current["feelslike_c"]
+        umidade = current["humidity"]
+        vento = current["wind_kph"]
+        direcao_vento = current["wind_dir"]
+        condicao = formatar_condicao_tempo(current["condition"]["text"])
+        emoji = obter_emoji_tempo(current["condition"]["text"])
+    
+        # Previsão para hoje
+        max_temp = forecast["day"]["maxtemp_c"]
+        min_temp = forecast["day"]["mintemp_c"]
+        chance_chuva = forecast["day"]["daily_chance_of_rain"]
+        precipitacao = forecast["day"]["totalprecip_mm"]
+    
+        mensagem = f"""
 📊 **RELATÓRIO METEOROLÓGICO COMPLETO**
 📍 {location['cidade']}/{location['estado']}
 🕐 {current['last_updated']}
@@ -454,6 +565,9 @@ async def relatorio_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🏠 **STATUS DA LONA:**
 • {'🔴 Recomendado baixar' if chance_chuva >= 70 or vento > 40 else '🟢 Pode manter'}
 """
+        return mensagem
+    
+    mensagem = _renderizar(location, previsao, 'relatorio', montar)
     
     await enviar_resposta(update, mensagem, criar_menu_voltar())
 
@@ -472,6 +586,7 @@ available_commands = {
     'clima': clima_command,
     'chuva': chance_chuva_callback,
     'drone': drone_command,
+    'droneperfil': drone_perfil_command,
     'config': config_command,
     'cep': cep_command,
     'diasdechuva': dias_chuva_command,
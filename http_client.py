@@ -0,0 +1,95 @@
+import time
+import httpx
+from urllib.parse import urlparse
+from config import (logger, HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE,
+                    WEATHERAPI_URL, OPENMETEO_URL, VIACEP_URL, NOMINATIM_URL)
+from metrics import latencia_upstream, erros_upstream
+
+# Clientes compartilhados (criados sob demanda)
+_cliente_async = None
+_cliente_sync = None
+
+# Transporte alternativo (ex.: servidores simulados em benchmarks e testes)
+_transporte = None
+
+def _limites():
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE
+    )
+
+# Nome do serviço externo por host, usado como rótulo das métricas
+SERVICOS = {
+    urlparse(WEATHERAPI_URL).hostname: 'weatherapi',
+    urlparse(OPENMETEO_URL).hostname: 'openmeteo',
+    urlparse(VIACEP_URL).hostname: 'viacep',
+    urlparse(NOMINATIM_URL).hostname: 'nominatim'
+}
+
+class TransporteMedido(httpx.AsyncBaseTransport):
+    """
+    Registra latência e falhas de cada requisição por serviço externo
+    """
+    def __init__(self, transporte):
+        self.transporte = transporte
+
+    async def handle_async_request(self, request):
+        servico = SERVICOS.get(request.url.host, request.url.host)
+        inicio = time.perf_counter()
+        try:
+            response = await self.transporte.handle_async_request(request)
+        except httpx.TimeoutException:
+            erros_upstream.inc(servico, 'timeout')
+            raise
+        except httpx.HTTPError:
+            erros_upstream.inc(servico, 'rede')
+            raise
+        finally:
+            latencia_upstream.observar(servico, valor=time.perf_counter() - inicio)
+        if response.status_code >= 400:
+            erros_upstream.inc(servico, str(response.status_code))
+        return response
+
+    async def aclose(self):
+        await self.transporte.aclose()
+
+def obter_cliente_async():
+    """
+    Retorna o cliente HTTP assíncrono compartilhado (pool keep-alive)
+    """
+    global _cliente_async
+    if _cliente_async is None or _cliente_async.is_closed:
+        transporte = _transporte or httpx.AsyncHTTPTransport(limits=_limites())
+        _cliente_async = httpx.AsyncClient(timeout=HTTP_TIMEOUT, transport=TransporteMedido(transporte))
+    return _cliente_async
+
+def obter_cliente_sync():
+    """
+    Retorna o cliente HTTP síncrono compartilhado, usado pelos chamadores legados
+    """
+    global _cliente_sync
+    if _cliente_sync is None or _cliente_sync.is_closed:
+        _cliente_sync = httpx.Client(timeout=HTTP_TIMEOUT, limits=_limites())
+    return _cliente_sync
+
+def usar_transporte(transporte):
+    """
+    Direciona as requisições assíncronas para outro transporte httpx
+    (ex.: httpx.MockTransport com respostas gravadas)
+    """
+    global _transporte, _cliente_async
+    _transporte = transporte
+    _cliente_async = None
+
+async def fechar_clientes(*args):
+    """
+    Fecha os clientes HTTP compartilhados (usado no desligamento do bot)
+    """
+    global _cliente_async, _cliente_sync
+    if _cliente_async is not None:
+        await _cliente_async.aclose()
+        _cliente_async = None
+    if _cliente_sync is not None:
+        _cliente_sync.close()
+        _cliente_sync = None
+    logger.info("Clientes HTTP encerrados")
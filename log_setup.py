@@ -0,0 +1,98 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+from datetime import datetime
+
+# Segredos reconhecidos por formato, mesmo sem conhecer o valor
+_PADROES_SEGREDO = [
+    # Parâmetros de consulta (ex.: ?key=... do WeatherAPI nas linhas do httpx)
+    (re.compile(r'([?&](?:key|api_key|apikey|token|secret)=)[^&\s"\']+', re.IGNORECASE), r'\1***'),
+    # Tokens de bot do Telegram (123456:ABC...), inclusive em URLs /bot<token>/
+    (re.compile(r'(?<!\d)\d{6,}:[A-Za-z0-9_-]{30,}'), '***'),
+    # Credenciais em URLs (ex.: redis://:senha@host)
+    (re.compile(r'([a-z][a-z0-9+.-]*://)[^\s/@]+@', re.IGNORECASE), r'\1***@')
+]
+
+# Variáveis de ambiente cujos valores nunca devem aparecer no log
+VARIAVEIS_SECRETAS = ('WEATHERAPI_KEY', 'TELEGRAM_BOT_TOKEN', 'WEBHOOK_SECRET')
+
+def mascarar(texto, segredos=()):
+    """Substitui chaves de API e tokens por ***"""
+    for segredo in segredos:
+        texto = texto.replace(segredo, '***')
+    for padrao, substituto in _PADROES_SEGREDO:
+        texto = padrao.sub(substituto, texto)
+    return texto
+
+class FiltroSegredos(logging.Filter):
+    """
+    Mascara segredos na mensagem final (e no traceback) de cada registro,
+    antes que ele seja enfileirado para os handlers
+    """
+    def __init__(self):
+        super().__init__()
+        self.segredos = [v for v in (os.getenv(n, '') for n in VARIAVEIS_SECRETAS) if len(v) >= 4]
+
+    def filter(self, record):
+        record.msg = mascarar(record.getMessage(), self.segredos)
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = mascarar(record.exc_text, self.segredos)
+        return True
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por registro (o traceback já vem na mensagem pelo QueueHandler)"""
+    def format(self, record):
+        dados = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage()
+        }
+        return json.dumps(dados, ensure_ascii=False)
+
+def _arquivo(caminho, rotacao, max_bytes, copias):
+    if rotacao == 'tempo':
+        return logging.handlers.TimedRotatingFileHandler(
+            caminho, when='midnight', backupCount=copias, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(
+        caminho, maxBytes=max_bytes, backupCount=copias, encoding='utf-8')
+
+def configurar_logging(caminho, nivel='INFO', formato='texto', rotacao='tamanho',
+                       max_bytes=10 * 1024 * 1024, copias=5):
+    """
+    Configura o logging assíncrono: os chamadores apenas enfileiram os
+    registros (QueueHandler) e uma thread (QueueListener) grava no arquivo
+    rotativo e no console. Retorna o listener
+    """
+    if formato == 'json':
+        formatador = FormatoJSON()
+    else:
+        formatador = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    destinos = [logging.StreamHandler()]
+    if caminho:
+        destinos.append(_arquivo(caminho, rotacao, max_bytes, copias))
+    for destino in destinos:
+        destino.setFormatter(formatador)
+
+    fila = queue.SimpleQueue()
+    entrada = logging.handlers.QueueHandler(fila)
+    entrada.addFilter(FiltroSegredos())
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(entrada)
+    raiz.setLevel(nivel)
+
+    listener = logging.handlers.QueueListener(fila, *destinos, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from bisect import bisect_left
+from config import logger, METRICS_LISTEN, METRICS_PORT, METRICS_BUCKETS
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _rotulos(nomes, valores):
+    """Formata os rótulos de uma amostra: {nome="valor",...}"""
+    if not nomes:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)) + '}'
+
+class Contador:
+    """
+    Contador monotônico com rótulos; `funcao` (opcional) lê contadores
+    mantidos por outro módulo a cada coleta: {tupla_de_rotulos: valor}
+    """
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao, rotulos=(), funcao=None):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        self.funcao = funcao
+
+    def inc(self, *rotulos, valor=1):
+        self.valores[rotulos] = self.valores.get(rotulos, 0) + valor
+
+    def amostras(self):
+        valores = self.funcao() if self.funcao else self.valores
+        for rotulos, valor in valores.items():
+            yield self.nome, _rotulos(self.rotulos, rotulos), valor
+
+class Medidor:
+    """
+    Valor instantâneo; `funcao` (opcional) é consultada a cada coleta
+    e retorna {tupla_de_rotulos: valor}
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nome, descricao, rotulos=(), funcao=None):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        self.funcao = funcao
+
+    def definir(self, *rotulos, valor):
+        self.valores[rotulos] = valor
+
+    def amostras(self):
+        valores = self.funcao() if self.funcao else self.valores
+        for rotulos, valor in valores.items():
+            yield self.nome, _rotulos(self.rotulos, rotulos), valor
+
+class Histograma:
+    """Histograma cumulativo com limites fixos (em segundos)"""
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos=(), limites=METRICS_BUCKETS):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self.series = {}
+
+    def observar(self, *rotulos, valor):
+        serie = self.series.get(rotulos)
+        if serie is None:
+            # [contagens por faixa..., +Inf], soma
+            serie = self.series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+        serie[0][bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+
+    def amostras(self):
+        for rotulos, (contagens, soma) in self.series.items():
+            acumulado = 0
+            for limite, contagem in zip(self.limites + ('+Inf',), contagens):
+                acumulado += contagem
+                yield (f"{self.nome}_bucket",
+                       _rotulos(self.rotulos + ('le',), rotulos + (limite,)), acumulado)
+            yield f"{self.nome}_sum", _rotulos(self.rotulos, rotulos), soma
+            yield f"{self.nome}_count", _rotulos(self.rotulos, rotulos), acumulado
+
+class RegistroMetricas:
+    """Conjunto de métricas expostas no endpoint /metrics"""
+    def __init__(self):
+        self.metricas = []
+
+    def registrar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, descricao, rotulos=(), funcao=None):
+        return self.registrar(Contador(nome, descricao, rotulos, funcao))
+
+    def medidor(self, nome, descricao, rotulos=(), funcao=None):
+        return self.registrar(Medidor(nome, descricao, rotulos, funcao))
+
+    def histograma(self, nome, descricao, rotulos=(), limites=METRICS_BUCKETS):
+        return self.registrar(Histograma(nome, descricao, rotulos, limites))
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        linhas = []
+        for metrica in self.metricas:
+            try:
+                amostras = list(metrica.amostras())
+            except Exception as e:
+                logger.error(f"Erro ao coletar a métrica {metrica.nome}: {e}")
+                continue
+            linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            for nome, rotulos, valor in amostras:
+                linhas.append(f"{nome}{rotulos} {valor}")
+        return '\n'.join(linhas) + '\n'
+
+class Cronometro:
+    """
+    Mede a duração de um bloco e a registra em um histograma:
+        with Cronometro(latencia_handler, 'comando', 'clima'): ...
+    """
+    def __init__(self, histograma, *rotulos):
+        self.histograma = histograma
+        self.rotulos = rotulos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observar(*self.rotulos, valor=time.perf_counter() - self.inicio)
+        return False
+
+def medir_handler(tipo, nome, handler):
+    """Envolve um handler do Telegram registrando sua latência"""
+    async def medido(update, context):
+        with Cronometro(latencia_handler, tipo, nome):
+            return await handler(update, context)
+    return medido
+
+async def _atender(reader, writer):
+    """Servidor HTTP mínimo: responde GET /metrics"""
+    try:
+        requisicao = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Descarta os cabeçalhos
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+            pass
+
+        partes = requisicao.decode('latin-1').split()
+        if len(partes) >= 2 and partes[0] == 'GET' and partes[1].split('?')[0] == '/metrics':
+            status, corpo = '200 OK', registro.exportar().encode()
+        else:
+            status, corpo = '404 Not Found', b'not found\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + corpo
+        )
+        await writer.drain()
+    except Exception as e:
+        logger.error(f"Erro no endpoint de métricas: {e}")
+    finally:
+        writer.close()
+
+async def iniciar_servidor_metricas(porta=METRICS_PORT, endereco=METRICS_LISTEN):
+    """Inicia o endpoint /metrics (retorna None se desativado)"""
+    if not porta:
+        return None
+    servidor = await asyncio.start_server(_atender, endereco, porta)
+    logger.info(f"Métricas disponíveis em http://{endereco}:{porta}/metrics")
+    return servidor
+
+# Registro global e métricas instrumentadas pelos demais módulos
+registro = RegistroMetricas()
+
+latencia_handler = registro.histograma(
+    'bot_handler_latency_seconds', 'Latência dos handlers do Telegram', ('tipo', 'nome'))
+latencia_upstream = registro.histograma(
+    'bot_upstream_latency_seconds', 'Latência das APIs externas', ('servico',))
+erros_upstream = registro.contador(
+    'bot_upstream_errors_total', 'Falhas nas APIs externas (rede ou HTTP >= 400)', ('servico', 'motivo'))
+requisicoes_provedor = registro.contador(
+    'bot_forecast_provider_total', 'Resultados por provedor de previsão (sucesso, falha, hedge, lote)', ('provedor', 'resultado'))
+chamadas_evitadas = registro.contador(
+    'bot_api_calls_saved_total', 'Chamadas à Bot API evitadas (edição igual, clique agrupado)', ('motivo',))
+mensagens_enviadas = registro.contador(
+    'bot_send_total', 'Mensagens proativas processadas pela fila de envio', ('resultado',))
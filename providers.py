@@ -0,0 +1,359 @@
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone, timedelta
+import httpx
+from config import (logger, WEATHERAPI_URL, OPENMETEO_URL, WEATHER_PROVIDERS, HEDGE_ENABLED,
+                    HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY, HEDGE_MAX_DELAY, HEDGE_SAMPLES, FETCH_PROFILES,
+                    WEATHERAPI_BULK, BULK_MAX_LOCATIONS)
+from forecast_model import PERFIL_COMPLETO
+from http_client import obter_cliente_async
+from metrics import requisicoes_provedor
+
+class ProvedorPrevisao:
+    """
+    Fonte de previsões. Cada adaptador monta a requisição e normaliza a
+    resposta no formato do WeatherAPI (forecast.json), que é o formato
+    interno lido por forecast_model.processar_previsao e guardado em disco.
+    """
+    nome = ''
+
+    def __init__(self, url_base):
+        self.url_base = url_base.rstrip('/')
+        self.latencias = deque(maxlen=HEDGE_SAMPLES)
+
+    def disponivel(self):
+        """Se o provedor está configurado (ex.: possui chave de API)"""
+        return True
+
+    def montar_requisicao(self, latitude, longitude, perfil=PERFIL_COMPLETO):
+        """Retorna (url, params) da requisição com o conteúdo do perfil"""
+        raise NotImplementedError
+
+    def normalizar(self, dados):
+        """Converte a resposta para o formato interno"""
+        raise NotImplementedError
+
+    def suporta_lote(self):
+        """Se o provedor aceita vários locais em uma única requisição"""
+        return False
+
+    async def buscar_lote(self, coordenadas, perfil=PERFIL_COMPLETO):
+        """
+        Busca vários locais [(latitude, longitude)] em uma requisição.
+        Retorna a lista de payloads normalizados na mesma ordem (None nos que falharam)
+        """
+        raise NotImplementedError
+
+    def processar(self, response):
+        """Valida a resposta HTTP e retorna o payload normalizado, ou None"""
+        if response.status_code != 200:
+            logger.error(f"Erro na API {self.nome}: {response.status_code} - {response.text[:200]}")
+            return None
+        return self.normalizar(response.json())
+
+    def atraso_hedge(self):
+        """Espera antes de acionar o próximo provedor: p95 das latências recentes"""
+        if len(self.latencias) < 5:
+            return HEDGE_DEFAULT_DELAY
+        ordenadas = sorted(self.latencias)
+        p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+    async def buscar(self, latitude, longitude, perfil=PERFIL_COMPLETO):
+        """Busca a previsão no provedor; retorna o payload normalizado ou None"""
+        url, params = self.montar_requisicao(latitude, longitude, perfil)
+        inicio = time.perf_counter()
+        try:
+            logger.info(f"Fazendo requisição para API do tempo ({self.nome}): {url}")
+            response = await obter_cliente_async().get(url, params=params)
+            payload = self.processar(response)
+        except httpx.HTTPError as e:
+            logger.error(f"Erro de conexão com a API {self.nome}: {e}")
+            payload = None
+        except Exception as e:
+            logger.error(f"Resposta inválida da API {self.nome}: {e}")
+            payload = None
+        if payload is not None:
+            self.latencias.append(time.perf_counter() - inicio)
+        return payload
+
+class WeatherAPIProvedor(ProvedorPrevisao):
+    """api.weatherapi.com (formato interno de referência)"""
+    nome = 'weatherapi'
+
+    def disponivel(self):
+        return bool(os.getenv("WEATHERAPI_KEY"))
+
+    def montar_requisicao(self, latitude, longitude, perfil=PERFIL_COMPLETO):
+        conteudo = FETCH_PROFILES[perfil]
+        params = {
+            'key': os.getenv("WEATHERAPI_KEY"),
+            'q': f"{latitude},{longitude}",
+            'aqi': 'yes' if conteudo.get('aqi') else 'no'
+        }
+        if not conteudo['dias']:
+            return f"{self.url_base}/current.json", params
+        params['days'] = conteudo['dias']
+        params['alerts'] = 'yes' if conteudo.get('alerts') else 'no'
+        return f"{self.url_base}/forecast.json", params
+
+    def normalizar(self, dados):
+        return dados
+
+    def suporta_lote(self):
+        return WEATHERAPI_BULK
+
+    async def buscar_lote(self, coordenadas, perfil=PERFIL_COMPLETO):
+        url, params = self.montar_requisicao(0, 0, perfil)
+        params['q'] = 'bulk'
+        corpo = {'locations': [
+            {'q': f"{latitude},{longitude}", 'custom_id': str(i)}
+            for i, (latitude, longitude) in enumerate(coordenadas)
+        ]}
+        logger.info(f"Requisição em lote ({self.nome}): {len(coordenadas)} local(is)")
+        response = await obter_cliente_async().post(url, params=params, json=corpo)
+        resultados = [None] * len(coordenadas)
+        dados = self.processar(response)
+        for item in (dados or {}).get('bulk', []):
+            consulta = item.get('query', {})
+            indice = consulta.get('custom_id')
+            if indice is not None and indice.isdigit() and int(indice) < len(resultados) and 'current' in consulta:
+                resultados[int(indice)] = {
+                    chave: valor for chave, valor in consulta.items() if chave not in ('custom_id', 'q')
+                }
+        return resultados
+
+# Códigos WMO do Open-Meteo -> textos de condição do WeatherAPI
+CONDICOES_WMO = {
+    0: 'Sunny', 1: 'Partly cloudy', 2: 'Partly cloudy', 3: 'Overcast',
+    45: 'Fog', 48: 'Fog',
+    51: 'Light rain', 53: 'Light rain', 55: 'Moderate rain', 56: 'Light rain', 57: 'Moderate rain',
+    61: 'Light rain', 63: 'Moderate rain', 65: 'Heavy rain', 66: 'Light rain', 67: 'Heavy rain',
+    80: 'Patchy rain possible', 81: 'Moderate rain', 82: 'Heavy rain',
+    95: 'Thundery outbreaks possible', 96: 'Thundery outbreaks possible', 99: 'Thundery outbreaks possible'
+}
+
+_PONTOS_CARDEAIS = ('N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+                    'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+
+def _condicao(codigo):
+    return {'text': CONDICOES_WMO.get(codigo, 'Cloudy'), 'code': codigo}
+
+def _direcao(graus):
+    return _PONTOS_CARDEAIS[int(((graus or 0) % 360) / 22.5 + 0.5) % 16]
+
+def _numero(valor, padrao=0):
+    return padrao if valor is None else valor
+
+class OpenMeteoProvedor(ProvedorPrevisao):
+    """api.open-meteo.com (sem chave), normalizado para o formato do WeatherAPI"""
+    nome = 'openmeteo'
+
+    HORARIAS = ('temperature_2m', 'precipitation_probability', 'precipitation', 'wind_speed_10m',
+                'wind_gusts_10m', 'visibility', 'weather_code')
+    ATUAIS = ('temperature_2m', 'apparent_temperature', 'relative_humidity_2m', 'wind_speed_10m',
+              'wind_direction_10m', 'wind_gusts_10m', 'weather_code')
+    DIARIAS = ('weather_code', 'temperature_2m_max', 'temperature_2m_min', 'precipitation_probability_max',
+               'precipitation_sum', 'wind_speed_10m_max')
+
+    def montar_requisicao(self, latitude, longitude, perfil=PERFIL_COMPLETO):
+        dias = FETCH_PROFILES[perfil]['dias']
+        params = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'current': ','.join(self.ATUAIS),
+            'timezone': 'auto',
+            'timeformat': 'unixtime'
+        }
+        if dias:
+            params['hourly'] = ','.join(self.HORARIAS)
+            params['daily'] = ','.join(self.DIARIAS)
+            params['forecast_days'] = dias
+        else:
+            # A visibilidade atual só existe na série horária
+            params['hourly'] = 'visibility'
+            params['forecast_days'] = 1
+        return f"{self.url_base}/forecast", params
+
+    def normalizar(self, dados):
+        fuso = timezone(timedelta(seconds=dados.get('utc_offset_seconds', 0)))
+
+        def local(epoch, formato='%Y-%m-%d %H:%M'):
+            return datetime.fromtimestamp(epoch, fuso).strftime(formato)
+
+        horarias = dados.get('hourly', {})
+        diarias = dados.get('daily')
+        horas_por_data = {}
+        for i, epoch in enumerate(horarias['time'] if diarias else ()):
+            horas_por_data.setdefault(local(epoch, '%Y-%m-%d'), []).append({
+                'time_epoch': epoch,
+                'time': local(epoch),
+                'temp_c': _numero(horarias['temperature_2m'][i]),
+                'chance_of_rain': _numero(horarias['precipitation_probability'][i]),
+                'precip_mm': _numero(horarias['precipitation'][i]),
+                'wind_kph': _numero(horarias['wind_speed_10m'][i]),
+                'gust_kph': _numero(horarias['wind_gusts_10m'][i]),
+                'vis_km': _numero(horarias['visibility'][i], 10000) / 1000,
+                'condition': _condicao(horarias['weather_code'][i])
+            })
+
+        forecastday = []
+        for i, epoch in enumerate(diarias['time'] if diarias else ()):
+            data = local(epoch, '%Y-%m-%d')
+            forecastday.append({
+                'date': data,
+                'date_epoch': epoch,
+                'day': {
+                    'maxtemp_c': _numero(diarias['temperature_2m_max'][i]),
+                    'mintemp_c': _numero(diarias['temperature_2m_min'][i]),
+                    'daily_chance_of_rain': _numero(diarias['precipitation_probability_max'][i]),
+                    'totalprecip_mm': _numero(diarias['precipitation_sum'][i]),
+                    'maxwind_kph': _numero(diarias['wind_speed_10m_max'][i]),
+                    'condition': _condicao(diarias['weather_code'][i])
+                },
+                'hour': horas_por_data.get(data, [])
+            })
+
+        atual = dados['current']
+        # A visibilidade não faz parte de `current`: usa a da hora corrente
+        visibilidades = horarias.get('visibility') or [None]
+        indice_hora = max(0, min(len(visibilidades) - 1,
+                                 sum(1 for epoch in horarias.get('time', ()) if epoch <= atual['time']) - 1))
+        payload = {
+            'location': {
+                'lat': dados.get('latitude'),
+                'lon': dados.get('longitude'),
+                'tz_id': dados.get('timezone', ''),
+                'localtime_epoch': atual['time']
+            },
+            'current': {
+                'last_updated_epoch': atual['time'],
+                'last_updated': local(atual['time']),
+                'temp_c': _numero(atual['temperature_2m']),
+                'feelslike_c': _numero(atual['apparent_temperature']),
+                'humidity': _numero(atual['relative_humidity_2m']),
+                'wind_kph': _numero(atual['wind_speed_10m']),
+                'gust_kph': _numero(atual['wind_gusts_10m']),
+                'wind_dir': _direcao(atual['wind_direction_10m']),
+                'vis_km': _numero(visibilidades[indice_hora], 10000) / 1000,
+                'condition': _condicao(atual['weather_code'])
+            }
+        }
+        if diarias:
+            payload['forecast'] = {'forecastday': forecastday}
+        return payload
+
+    def suporta_lote(self):
+        return True
+
+    async def buscar_lote(self, coordenadas, perfil=PERFIL_COMPLETO):
+        url, params = self.montar_requisicao(0, 0, perfil)
+        # Vários locais: coordenadas separadas por vírgula, resposta em lista
+        params['latitude'] = ','.join(str(latitude) for latitude, _ in coordenadas)
+        params['longitude'] = ','.join(str(longitude) for _, longitude in coordenadas)
+        logger.info(f"Requisição em lote ({self.nome}): {len(coordenadas)} local(is)")
+        response = await obter_cliente_async().get(url, params=params)
+        if response.status_code != 200:
+            logger.error(f"Erro na API {self.nome}: {response.status_code} - {response.text[:200]}")
+            return [None] * len(coordenadas)
+        dados = response.json()
+        if isinstance(dados, dict):
+            dados = [dados]
+        resultados = [self.normalizar(item) for item in dados[:len(coordenadas)]]
+        return resultados + [None] * (len(coordenadas) - len(resultados))
+
+ADAPTADORES = {
+    'weatherapi': lambda: WeatherAPIProvedor(WEATHERAPI_URL),
+    'openmeteo': lambda: OpenMeteoProvedor(OPENMETEO_URL)
+}
+
+def criar_provedores(nomes=WEATHER_PROVIDERS):
+    """Instancia os provedores configurados, na ordem de preferência"""
+    provedores = []
+    for nome in nomes:
+        if nome in ADAPTADORES:
+            provedores.append(ADAPTADORES[nome]())
+        else:
+            logger.warning(f"Provedor de previsão desconhecido: {nome}")
+    return provedores
+
+async def buscar_previsao(latitude, longitude, perfil=PERFIL_COMPLETO, provedores=None, hedge=HEDGE_ENABLED):
+    """
+    Busca a previsão no primeiro provedor disponível. Se ele falhar, o
+    próximo é acionado imediatamente; se demorar mais que o seu p95
+    (hedge), o próximo é acionado em paralelo e vale a primeira resposta.
+    Retorna o payload normalizado, ou None
+    """
+    fila = [p for p in (provedores if provedores is not None else provedores_ativos) if p.disponivel()]
+    if not fila:
+        logger.error("Nenhum provedor de previsão configurado")
+        return None
+
+    tarefas = {}
+
+    def acionar():
+        provedor = fila.pop(0)
+        tarefas[asyncio.ensure_future(provedor.buscar(latitude, longitude, perfil))] = provedor
+        return provedor
+
+    ultimo = acionar()
+    try:
+        while tarefas:
+            atraso = ultimo.atraso_hedge() if hedge and fila else None
+            concluidas, _ = await asyncio.wait(tarefas, timeout=atraso, return_when=asyncio.FIRST_COMPLETED)
+            if not concluidas:
+                logger.info(f"{ultimo.nome} demorou mais de {atraso:.2f}s, acionando {fila[0].nome}")
+                requisicoes_provedor.inc(ultimo.nome, 'hedge')
+                ultimo = acionar()
+                continue
+
+            for tarefa in concluidas:
+                provedor = tarefas.pop(tarefa)
+                payload = tarefa.result()
+                if payload is not None:
+                    requisicoes_provedor.inc(provedor.nome, 'sucesso')
+                    return payload
+                requisicoes_provedor.inc(provedor.nome, 'falha')
+
+            # Falha: aciona o próximo sem esperar (failover)
+            if fila and not tarefas:
+                ultimo = acionar()
+        return None
+    finally:
+        for tarefa in tarefas:
+            tarefa.cancel()
+
+async def buscar_previsoes_em_lote(coordenadas, perfil=PERFIL_COMPLETO, provedores=None):
+    """
+    Busca vários locais no provedor principal em requisições de até
+    BULK_MAX_LOCATIONS locais, disparadas em paralelo. Retorna a lista de
+    payloads na ordem de `coordenadas` (None nos que falharam), ou None
+    se o provedor principal não aceita lotes
+    """
+    disponiveis = [p for p in (provedores if provedores is not None else provedores_ativos) if p.disponivel()]
+    if not disponiveis or not disponiveis[0].suporta_lote():
+        return None
+    provedor = disponiveis[0]
+
+    async def buscar_parte(parte):
+        try:
+            return await provedor.buscar_lote(parte, perfil)
+        except httpx.HTTPError as e:
+            logger.error(f"Erro de conexão na requisição em lote ({provedor.nome}): {e}")
+        except Exception as e:
+            logger.error(f"Resposta inválida na requisição em lote ({provedor.nome}): {e}")
+        return [None] * len(parte)
+
+    partes = [coordenadas[i:i + BULK_MAX_LOCATIONS] for i in range(0, len(coordenadas), BULK_MAX_LOCATIONS)]
+    resultados = []
+    for parte in await asyncio.gather(*[buscar_parte(parte) for parte in partes]):
+        resultados.extend(parte)
+    obtidos = sum(1 for payload in resultados if payload is not None)
+    requisicoes_provedor.inc(provedor.nome, 'lote', valor=len(partes))
+    logger.info(f"Lote concluído: {obtidos}/{len(coordenadas)} local(is) em {len(partes)} requisição(ões)")
+    return resultados
+
+# Provedores em uso, na ordem de WEATHER_PROVIDERS
+provedores_ativos = criar_provedores()
@@ -0,0 +1,245 @@
+"""
+Servidor local mínimo compatível com o protocolo do Redis (RESP), em
+memória, para rodar o modo multiprocesso com STATE_BACKEND=redis sem um
+Redis instalado (desenvolvimento e testes). Implementa apenas os comandos
+usados pelo estado compartilhado.
+
+    python redis_local.py --porta 6379
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+
+class ErroComando(Exception):
+    """Erro devolvido ao cliente como resposta de erro do RESP"""
+
+class BancoLocal:
+    """Chaves em memória (strings, hashes e conjuntos) com expiração"""
+    def __init__(self):
+        self.dados = {}
+        self.expira = {}
+
+    def _vivo(self, chave):
+        prazo = self.expira.get(chave)
+        if prazo is not None and time.monotonic() >= prazo:
+            self.dados.pop(chave, None)
+            del self.expira[chave]
+        return chave in self.dados
+
+    def _valor(self, chave, tipo):
+        if not self._vivo(chave):
+            return None
+        valor = self.dados[chave]
+        if not isinstance(valor, tipo):
+            raise ErroComando("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return valor
+
+    def _definir_prazo(self, chave, segundos):
+        self.expira[chave] = time.monotonic() + segundos
+
+    def executar(self, comando, args):
+        metodo = getattr(self, f"cmd_{comando.lower()}", None)
+        if metodo is None:
+            raise ErroComando(f"ERR unknown command '{comando}'")
+        return metodo(*args)
+
+    # Conexão
+    def cmd_ping(self, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_select(self, indice):
+        return 'OK'
+
+    def cmd_flushdb(self, *args):
+        self.dados.clear()
+        self.expira.clear()
+        return 'OK'
+
+    cmd_flushall = cmd_flushdb
+
+    # Chaves
+    def cmd_del(self, *chaves):
+        removidas = 0
+        for chave in chaves:
+            if self._vivo(chave):
+                del self.dados[chave]
+                self.expira.pop(chave, None)
+                removidas += 1
+        return removidas
+
+    def cmd_exists(self, *chaves):
+        return sum(1 for chave in chaves if self._vivo(chave))
+
+    def cmd_expire(self, chave, segundos):
+        if not self._vivo(chave):
+            return 0
+        self._definir_prazo(chave, int(segundos))
+        return 1
+
+    def cmd_ttl(self, chave):
+        if not self._vivo(chave):
+            return -2
+        prazo = self.expira.get(chave)
+        return -1 if prazo is None else max(0, round(prazo - time.monotonic()))
+
+    def cmd_keys(self, padrao):
+        return [chave for chave in list(self.dados) if self._vivo(chave) and fnmatch.fnmatchcase(chave, padrao)]
+
+    # Strings
+    def cmd_get(self, chave):
+        return self._valor(chave, bytes)
+
+    def cmd_mget(self, *chaves):
+        return [self._valor(chave, bytes) for chave in chaves]
+
+    def cmd_set(self, chave, valor, *opcoes):
+        opcoes = [opcao.upper() for opcao in opcoes]
+        prazo = None
+        if b'EX' in opcoes:
+            prazo = int(opcoes[opcoes.index(b'EX') + 1])
+        elif b'PX' in opcoes:
+            prazo = int(opcoes[opcoes.index(b'PX') + 1]) / 1000
+        if b'NX' in opcoes and self._vivo(chave):
+            return None
+        self.dados[chave] = valor
+        self.expira.pop(chave, None)
+        if prazo is not None:
+            self._definir_prazo(chave, prazo)
+        return 'OK'
+
+    # Hashes
+    def cmd_hset(self, chave, *pares):
+        mapa = self._valor(chave, dict)
+        if mapa is None:
+            mapa = self.dados[chave] = {}
+        novos = 0
+        for campo, valor in zip(pares[::2], pares[1::2]):
+            novos += campo not in mapa
+            mapa[campo] = valor
+        return novos
+
+    def cmd_hget(self, chave, campo):
+        return (self._valor(chave, dict) or {}).get(campo)
+
+    def cmd_hdel(self, chave, *campos):
+        mapa = self._valor(chave, dict) or {}
+        removidos = sum(1 for campo in campos if mapa.pop(campo, None) is not None)
+        if chave in self.dados and not mapa:
+            self.cmd_del(chave)
+        return removidos
+
+    def cmd_hgetall(self, chave):
+        mapa = self._valor(chave, dict) or {}
+        return [item for par in mapa.items() for item in par]
+
+    # Conjuntos
+    def cmd_sadd(self, chave, *membros):
+        conjunto = self._valor(chave, set)
+        if conjunto is None:
+            conjunto = self.dados[chave] = set()
+        antes = len(conjunto)
+        conjunto.update(membros)
+        return len(conjunto) - antes
+
+    def cmd_srem(self, chave, *membros):
+        conjunto = self._valor(chave, set) or set()
+        antes = len(conjunto)
+        conjunto.difference_update(membros)
+        if chave in self.dados and not conjunto:
+            self.cmd_del(chave)
+        return antes - len(conjunto)
+
+    def cmd_smembers(self, chave):
+        return list(self._valor(chave, set) or ())
+
+def _codificar(valor):
+    """Codifica uma resposta no RESP2"""
+    if valor is None:
+        return b'$-1\r\n'
+    if isinstance(valor, ErroComando):
+        return f"-{valor}\r\n".encode()
+    if isinstance(valor, str):
+        return f"+{valor}\r\n".encode()
+    if isinstance(valor, int):
+        return f":{valor}\r\n".encode()
+    if isinstance(valor, bytes):
+        return b'$%d\r\n%s\r\n' % (len(valor), valor)
+    return b'*%d\r\n' % len(valor) + b''.join(_codificar(item) for item in valor)
+
+async def _ler_comando(reader):
+    """Lê um comando (array de bulk strings); None no fim da conexão"""
+    linha = await reader.readline()
+    if not linha:
+        return None
+    if not linha.startswith(b'*'):
+        # Comando em linha (ex.: telnet)
+        return linha.split()
+    argumentos = []
+    for _ in range(int(linha[1:])):
+        tamanho = int((await reader.readline())[1:])
+        argumentos.append((await reader.readexactly(tamanho + 2))[:-2])
+    return argumentos
+
+class ServidorRedisLocal:
+    """Servidor asyncio que atende vários clientes sobre o mesmo BancoLocal"""
+    def __init__(self, banco=None):
+        self.banco = banco or BancoLocal()
+
+    def _responder(self, argumentos):
+        comando = argumentos[0].decode().upper()
+        # Chaves, campos e valores permanecem em bytes, como no Redis
+        args = argumentos[1:]
+        try:
+            return self.banco.executar(comando, args)
+        except ErroComando as e:
+            return e
+        except (TypeError, ValueError, IndexError):
+            return ErroComando(f"ERR wrong arguments for '{comando.lower()}' command")
+
+    async def atender(self, reader, writer):
+        transacao = None
+        try:
+            while (argumentos := await _ler_comando(reader)) is not None:
+                if not argumentos:
+                    continue
+                comando = argumentos[0].decode().upper()
+                if comando == 'MULTI':
+                    transacao, resposta = [], 'OK'
+                elif comando == 'EXEC' and transacao is not None:
+                    resposta = [self._responder(pendente) for pendente in transacao]
+                    transacao = None
+                elif comando == 'DISCARD' and transacao is not None:
+                    transacao, resposta = None, 'OK'
+                elif transacao is not None:
+                    transacao.append(argumentos)
+                    resposta = 'QUEUED'
+                else:
+                    resposta = self._responder(argumentos)
+                writer.write(_codificar(resposta))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def iniciar(self, endereco='127.0.0.1', porta=6379):
+        return await asyncio.start_server(self.atender, endereco, porta)
+
+async def _principal(args):
+    servidor = await ServidorRedisLocal().iniciar(args.endereco, args.porta)
+    print(f"Servidor compatível com Redis em {args.endereco}:{args.porta}")
+    async with servidor:
+        await servidor.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local compatível com o protocolo do Redis")
+    parser.add_argument('--endereco', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=6379)
+    try:
+        asyncio.run(_principal(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
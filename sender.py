@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import time
+from telegram.error import RetryAfter, Forbidden, BadRequest, NetworkError
+from config import (logger, SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST,
+                    SEND_MAX_CONCURRENT, SEND_MAX_RETRIES, WORKERS)
+from metrics import registro, mensagens_enviadas
+
+# Prioridades (menor sai primeiro)
+PRIORIDADE_ALERTA = 0
+PRIORIDADE_RELATORIO = 10
+
+class TokenBucket:
+    """
+    Balde de fichas: `taxa` fichas por segundo, acumulando até `capacidade`
+    """
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.fichas = capacidade
+        self.atualizado = time.monotonic()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def espera(self):
+        """Segundos até haver uma ficha disponível (0 se já houver)"""
+        self._recarregar()
+        return 0.0 if self.fichas >= 1 else (1 - self.fichas) / self.taxa
+
+    def consumir(self):
+        self._recarregar()
+        self.fichas -= 1
+
+    def cheio(self):
+        self._recarregar()
+        return self.fichas >= self.capacidade
+
+class FilaEnvio:
+    """
+    Fila de mensagens proativas (alertas, relatórios) com prioridade,
+    limite global e por chat (token bucket), tratamento de RetryAfter e
+    número limitado de envios simultâneos
+    """
+    def __init__(self, taxa_global=SEND_GLOBAL_RATE, taxa_chat=SEND_CHAT_RATE,
+                 rajada_chat=SEND_CHAT_BURST, concorrencia=SEND_MAX_CONCURRENT):
+        self.fila = asyncio.PriorityQueue()
+        self.balde_global = TokenBucket(taxa_global, taxa_global)
+        self.baldes_chat = {}
+        self.taxa_chat = taxa_chat
+        self.rajada_chat = rajada_chat
+        self.concorrencia = concorrencia
+        self._sequencia = itertools.count()
+        self._pausado_ate = 0.0
+        self._adiadas = 0
+        self._tarefas = []
+
+    def enfileirar(self, chat_id, texto, prioridade=PRIORIDADE_ALERTA, tentativa=0):
+        """Adiciona uma mensagem à fila de envio"""
+        self.fila.put_nowait((prioridade, next(self._sequencia), chat_id, texto, tentativa))
+
+    def tamanho(self):
+        """Mensagens aguardando envio (inclui as adiadas por limite do chat)"""
+        return self.fila.qsize() + self._adiadas
+
+    async def iniciar(self, bot):
+        """Inicia os consumidores da fila"""
+        if not self._tarefas:
+            self._tarefas = [
+                asyncio.create_task(self._processar(bot))
+                for _ in range(self.concorrencia)
+            ]
+
+    async def parar(self):
+        """Interrompe os consumidores da fila"""
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        self._tarefas = []
+
+    def _balde_chat(self, chat_id):
+        balde = self.baldes_chat.get(chat_id)
+        if balde is None:
+            balde = TokenBucket(self.taxa_chat, self.rajada_chat)
+            self.baldes_chat[chat_id] = balde
+            # Descarta baldes cheios (chats ociosos) para limitar a memória
+            if len(self.baldes_chat) > 10000:
+                self.baldes_chat = {c: b for c, b in self.baldes_chat.items() if not b.cheio()}
+                self.baldes_chat[chat_id] = balde
+        return balde
+
+    def _adiar(self, item, segundos):
+        """Devolve o item à fila após `segundos`, sem ocupar um consumidor"""
+        self._adiadas += 1
+
+        def _devolver():
+            self._adiadas -= 1
+            self.fila.put_nowait(item)
+
+        asyncio.get_running_loop().call_later(segundos, _devolver)
+
+    async def _aguardar_limite_global(self):
+        while True:
+            espera = max(self._pausado_ate - time.monotonic(), self.balde_global.espera())
+            if espera <= 0:
+                self.balde_global.consumir()
+                return
+            await asyncio.sleep(espera)
+
+    async def _processar(self, bot):
+        while True:
+            item = await self.fila.get()
+            prioridade, _, chat_id, texto, tentativa = item
+            try:
+                balde = self._balde_chat(chat_id)
+                espera = balde.espera()
+                if espera > 0:
+                    self._adiar(item, espera)
+                    continue
+
+                await self._aguardar_limite_global()
+                balde.consumir()
+                await bot.send_message(chat_id=chat_id, text=texto, parse_mode='Markdown')
+                mensagens_enviadas.inc('enviada')
+                logger.info(f"Mensagem enviada com sucesso para {chat_id}")
+
+            except RetryAfter as e:
+                segundos = e.retry_after
+                segundos = segundos.total_seconds() if hasattr(segundos, 'total_seconds') else float(segundos)
+                mensagens_enviadas.inc('retry_after')
+                logger.warning(f"Limite do Telegram atingido, pausando envios por {segundos}s")
+                self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+                self._adiar(item, segundos)
+            except (Forbidden, BadRequest) as e:
+                # Bot bloqueado ou chat inválido: não adianta tentar de novo
+                mensagens_enviadas.inc('descartada')
+                logger.error(f"Mensagem para {chat_id} descartada: {e}")
+            except NetworkError as e:
+                mensagens_enviadas.inc('erro_rede')
+                if tentativa < SEND_MAX_RETRIES:
+                    self._adiar((prioridade, next(self._sequencia), chat_id, texto, tentativa + 1), 2 ** tentativa)
+                else:
+                    logger.error(f"Erro ao enviar mensagem para {chat_id}: {e}")
+            except Exception as e:
+                mensagens_enviadas.inc('erro')
+                logger.error(f"Erro ao enviar mensagem para {chat_id}: {e}")
+            finally:
+                self.fila.task_done()
+
+# Instância global da fila de envio (o limite global da Bot API é dividido entre os workers)
+fila_envio = FilaEnvio(taxa_global=SEND_GLOBAL_RATE / WORKERS)
+
+registro.medidor(
+    'bot_send_queue_depth', 'Mensagens aguardando na fila de envio (inclui adiadas)',
+    funcao=lambda: {(): fila_envio.tamanho()}
+)
@@ -0,0 +1,317 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from config import logger, weather_cache, SETTINGS_DB, STATE_BACKEND, REDIS_URL, REDIS_PREFIX, ALERT_COOLDOWN
+from forecast_model import PERFIL_COMPLETO
+from disk_cache import DiskCache
+
+class AssinantesSQLite:
+    """
+    Inscrições nos alertas na tabela `assinantes` do banco de configurações
+    (modo WAL: compartilhada entre os processos do mesmo host)
+    """
+    def __init__(self, caminho=SETTINGS_DB):
+        self.caminho = caminho
+        self._conexao = None
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        if self._conexao is None:
+            self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS assinantes (
+                    chat_id INTEGER PRIMARY KEY,
+                    area TEXT NOT NULL,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL
+                )
+            """)
+            self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_assinantes_area ON assinantes (area)")
+            self._conexao.commit()
+        return self._conexao
+
+    def listar(self):
+        """Retorna [(chat_id, area, latitude, longitude)] de todos os inscritos"""
+        with self._lock:
+            return self._conectar().execute(
+                "SELECT chat_id, area, latitude, longitude FROM assinantes"
+            ).fetchall()
+
+    def gravar(self, chat_id, area, latitude, longitude):
+        with self._lock:
+            conexao = self._conectar()
+            conexao.execute(
+                "INSERT OR REPLACE INTO assinantes VALUES (?, ?, ?, ?)",
+                (chat_id, area, latitude, longitude)
+            )
+            conexao.commit()
+
+    def apagar(self, chat_id):
+        with self._lock:
+            conexao = self._conectar()
+            conexao.execute("DELETE FROM assinantes WHERE chat_id = ?", (chat_id,))
+            conexao.commit()
+
+    def chats_da_area(self, area):
+        """Chats inscritos na área (consulta indexada)"""
+        with self._lock:
+            linhas = self._conectar().execute(
+                "SELECT chat_id FROM assinantes WHERE area = ?", (area,)
+            ).fetchall()
+        return {linha[0] for linha in linhas}
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+class IntervalosSQLite:
+    """
+    Horário do último alerta de cada tipo por chat, para respeitar o
+    intervalo mínimo entre alertas mesmo após reinícios
+    """
+    def __init__(self, caminho=SETTINGS_DB, intervalo_minutos=ALERT_COOLDOWN):
+        self.caminho = caminho
+        self.intervalo = intervalo_minutos * 60
+        self._conexao = None
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        if self._conexao is None:
+            self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("""
+                CREATE TABLE IF NOT EXISTS ultimos_alertas (
+                    chat_id INTEGER NOT NULL,
+                    tipo TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    PRIMARY KEY (chat_id, tipo)
+                )
+            """)
+            # Registros além do intervalo não bloqueiam mais nenhum alerta
+            self._conexao.execute(
+                "DELETE FROM ultimos_alertas WHERE timestamp < ?", (time.time() - self.intervalo,)
+            )
+            self._conexao.commit()
+        return self._conexao
+
+    def carregar(self, chat_ids):
+        """Retorna {(chat_id, tipo): timestamp} dos chats informados"""
+        chat_ids = list(chat_ids)
+        resultado = {}
+        with self._lock:
+            conexao = self._conectar()
+            # Em blocos, abaixo do limite de parâmetros do SQLite
+            for inicio in range(0, len(chat_ids), 500):
+                bloco = chat_ids[inicio:inicio + 500]
+                linhas = conexao.execute(
+                    f"SELECT chat_id, tipo, timestamp FROM ultimos_alertas "
+                    f"WHERE chat_id IN ({','.join('?' * len(bloco))})",
+                    bloco
+                ).fetchall()
+                resultado.update({(chat_id, tipo): timestamp for chat_id, tipo, timestamp in linhas})
+        return resultado
+
+    def registrar(self, registros, timestamp):
+        """Grava o horário dos alertas [(chat_id, tipo)] enviados"""
+        with self._lock:
+            conexao = self._conectar()
+            conexao.executemany(
+                "INSERT OR REPLACE INTO ultimos_alertas VALUES (?, ?, ?)",
+                [(chat_id, tipo, timestamp) for chat_id, tipo in registros]
+            )
+            conexao.commit()
+
+    def fechar(self):
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+class PrevisoesRedis:
+    """
+    Payloads das previsões por área no Redis (mesma interface do DiskCache),
+    expirando após `idade_maxima_minutos`
+    """
+    def __init__(self, cliente, prefixo=REDIS_PREFIX, idade_maxima_minutos=60):
+        self.cliente = cliente
+        self.prefixo = f"{prefixo}previsao:"
+        self.idade_maxima = idade_maxima_minutos * 60
+
+    def _registro(self, data, latitude, longitude, timestamp, perfil):
+        return json.dumps({
+            'payload': data, 'timestamp': timestamp, 'latitude': latitude,
+            'longitude': longitude, 'perfil': perfil
+        }, ensure_ascii=False)
+
+    def carregar(self, chave):
+        """
+        Retorna (payload, timestamp, latitude, longitude, perfil) da área, ou None
+        """
+        try:
+            valor = self.cliente.get(self.prefixo + chave)
+            if valor is None:
+                return None
+            registro = json.loads(valor)
+            if time.time() - registro['timestamp'] >= self.idade_maxima:
+                return None
+            return (registro['payload'], registro['timestamp'], registro['latitude'],
+                    registro['longitude'], registro['perfil'])
+        except Exception as e:
+            logger.error(f"Erro ao ler previsão do Redis: {e}")
+            return None
+
+    def salvar(self, chave, data, latitude, longitude, timestamp, perfil=PERFIL_COMPLETO):
+        """Grava (ou substitui) o payload da área, buscado com `perfil`"""
+        try:
+            self.cliente.set(
+                self.prefixo + chave, self._registro(data, latitude, longitude, timestamp, perfil),
+                ex=self.idade_maxima
+            )
+        except Exception as e:
+            logger.error(f"Erro ao gravar previsão no Redis: {e}")
+
+    def salvar_lote(self, registros, timestamp, perfil=PERFIL_COMPLETO):
+        """Grava vários payloads [(chave, data, latitude, longitude)] em uma ida ao servidor"""
+        try:
+            pipeline = self.cliente.pipeline(transaction=False)
+            for chave, data, latitude, longitude in registros:
+                pipeline.set(
+                    self.prefixo + chave, self._registro(data, latitude, longitude, timestamp, perfil),
+                    ex=self.idade_maxima
+                )
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Erro ao gravar previsões no Redis: {e}")
+
+    def fechar(self):
+        self.cliente.close()
+
+class AssinantesRedis:
+    """
+    Inscrições no Redis: um hash chat_id -> [área, latitude, longitude]
+    e um conjunto de chats por área
+    """
+    def __init__(self, cliente, prefixo=REDIS_PREFIX):
+        self.cliente = cliente
+        self.chave_hash = f"{prefixo}assinantes"
+        self.prefixo_area = f"{prefixo}assinantes:"
+
+    def listar(self):
+        """Retorna [(chat_id, area, latitude, longitude)] de todos os inscritos"""
+        return [
+            (int(chat_id), *json.loads(valor))
+            for chat_id, valor in self.cliente.hgetall(self.chave_hash).items()
+        ]
+
+    def gravar(self, chat_id, area, latitude, longitude):
+        anterior = self.cliente.hget(self.chave_hash, chat_id)
+        pipeline = self.cliente.pipeline()
+        if anterior is not None:
+            pipeline.srem(self.prefixo_area + json.loads(anterior)[0], chat_id)
+        pipeline.hset(self.chave_hash, chat_id, json.dumps([area, latitude, longitude]))
+        pipeline.sadd(self.prefixo_area + area, chat_id)
+        pipeline.execute()
+
+    def apagar(self, chat_id):
+        anterior = self.cliente.hget(self.chave_hash, chat_id)
+        if anterior is None:
+            return
+        pipeline = self.cliente.pipeline()
+        pipeline.srem(self.prefixo_area + json.loads(anterior)[0], chat_id)
+        pipeline.hdel(self.chave_hash, chat_id)
+        pipeline.execute()
+
+    def chats_da_area(self, area):
+        """Chats inscritos na área"""
+        return {int(chat_id) for chat_id in self.cliente.smembers(self.prefixo_area + area)}
+
+    def fechar(self):
+        self.cliente.close()
+
+class IntervalosRedis:
+    """
+    Horário do último alerta por chat (um hash tipo -> timestamp por chat),
+    expirando junto com o intervalo mínimo entre alertas
+    """
+    def __init__(self, cliente, prefixo=REDIS_PREFIX, intervalo_minutos=ALERT_COOLDOWN):
+        self.cliente = cliente
+        self.prefixo = f"{prefixo}alertas:"
+        self.intervalo = intervalo_minutos * 60
+
+    def carregar(self, chat_ids):
+        """Retorna {(chat_id, tipo): timestamp} dos chats informados"""
+        chat_ids = list(chat_ids)
+        pipeline = self.cliente.pipeline(transaction=False)
+        for chat_id in chat_ids:
+            pipeline.hgetall(f"{self.prefixo}{chat_id}")
+        resultado = {}
+        for chat_id, horarios in zip(chat_ids, pipeline.execute()):
+            resultado.update({(chat_id, tipo): float(timestamp) for tipo, timestamp in horarios.items()})
+        return resultado
+
+    def registrar(self, registros, timestamp):
+        """Grava o horário dos alertas [(chat_id, tipo)] enviados"""
+        pipeline = self.cliente.pipeline(transaction=False)
+        for chat_id, tipo in registros:
+            pipeline.hset(f"{self.prefixo}{chat_id}", tipo, timestamp)
+            pipeline.expire(f"{self.prefixo}{chat_id}", self.intervalo)
+        pipeline.execute()
+
+    def fechar(self):
+        self.cliente.close()
+
+class EstadoCompartilhado:
+    """
+    Estado visível a todos os processos do bot: payloads das previsões
+    (`previsoes`, None quando desativado), inscrições nos alertas
+    (`assinantes`) e horários dos últimos alertas (`intervalos`)
+    """
+    def __init__(self, backend, previsoes, assinantes, intervalos):
+        self.backend = backend
+        self.previsoes = previsoes
+        self.assinantes = assinantes
+        self.intervalos = intervalos
+
+    def fechar(self):
+        """Fecha as conexões do backend"""
+        for armazenamento in (self.previsoes, self.assinantes, self.intervalos):
+            if armazenamento is None:
+                continue
+            try:
+                armazenamento.fechar()
+            except Exception as e:
+                logger.error(f"Erro ao fechar o estado compartilhado: {e}")
+
+def criar_estado(backend=STATE_BACKEND):
+    """
+    Cria o estado compartilhado: 'sqlite' (arquivos locais em modo WAL,
+    compartilhados entre os processos do host) ou 'redis' (REDIS_URL;
+    qualquer servidor que fale o protocolo, como o redis_local.py)
+    """
+    if backend == 'redis':
+        import redis
+        cliente = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        url = urlparse(REDIS_URL)
+        logger.info(f"Estado compartilhado no Redis ({url.hostname}:{url.port or 6379}{url.path or '/0'})")
+        return EstadoCompartilhado(
+            backend,
+            PrevisoesRedis(cliente, idade_maxima_minutos=weather_cache['stale_max']),
+            AssinantesRedis(cliente),
+            IntervalosRedis(cliente)
+        )
+
+    if backend != 'sqlite':
+        logger.warning(f"STATE_BACKEND desconhecido ({backend}): usando sqlite")
+    previsoes = (
+        DiskCache(weather_cache['disk_path'], weather_cache['stale_max'])
+        if weather_cache['disk_path'] else None
+    )
+    return EstadoCompartilhado('sqlite', previsoes, AssinantesSQLite(), IntervalosSQLite())
+
+# Instância global usada pelo cache de previsões, assinantes e alertas
+estado_compartilhado = criar_estado()
@@ -0,0 +1,82 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from config import logger, STARTUP_WARM_CONCURRENCY, STARTUP_WARM_FRACTION, STARTUP_WARM_TIMEOUT
+from cache import forecast_cache
+from user_config import user_config
+from subscribers import subscriber_registry
+from weather import obter_previsao_tempo_async
+
+class Cronologia:
+    """Tempo gasto em cada fase da inicialização"""
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fases = []
+
+    @contextmanager
+    def fase(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases.append((nome, time.perf_counter() - inicio))
+
+    def resumo(self):
+        partes = [f"{nome}={duracao * 1000:.0f}ms" for nome, duracao in self.fases]
+        total = (time.perf_counter() - self.inicio) * 1000
+        return f"{', '.join(partes)}, total={total:.0f}ms"
+
+def areas_conhecidas():
+    """
+    Coordenadas de cada área com assinantes, mais o local padrão
+    """
+    areas = {area: (latitude, longitude) for area, (latitude, longitude, _) in subscriber_registry.por_area().items()}
+    padrao = user_config.get_location()
+    areas.setdefault(
+        forecast_cache.chave(padrao['latitude'], padrao['longitude']),
+        (padrao['latitude'], padrao['longitude'])
+    )
+    return areas
+
+async def aquecer_previsoes(areas, concorrencia=STARTUP_WARM_CONCURRENCY,
+                            fracao=STARTUP_WARM_FRACTION, timeout=STARTUP_WARM_TIMEOUT):
+    """
+    Busca as previsões das áreas com paralelismo limitado e retorna quando
+    `fracao` delas estiver em cache (ou após `timeout`); as demais
+    continuam em segundo plano. Retorna (aquecidas, total)
+    """
+    if not areas:
+        return 0, 0
+
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def aquecer(latitude, longitude):
+        async with semaforo:
+            return await obter_previsao_tempo_async(latitude, longitude, 'curto') is not None
+
+    tarefas = [asyncio.ensure_future(aquecer(lat, lon)) for lat, lon in areas.values()]
+    if fracao <= 0:
+        return 0, len(tarefas)
+    necessarias = max(1, math.ceil(len(tarefas) * fracao))
+    aquecidas = 0
+    try:
+        for proxima in asyncio.as_completed(tarefas, timeout=timeout):
+            if await proxima:
+                aquecidas += 1
+            if aquecidas >= necessarias:
+                break
+    except asyncio.TimeoutError:
+        logger.warning(f"Aquecimento do cache excedeu {timeout}s; iniciando com {aquecidas}/{len(tarefas)} áreas")
+    return aquecidas, len(tarefas)
+
+async def preparar_inicializacao(cronologia):
+    """
+    Carrega os assinantes fora do loop de eventos e aquece o cache de
+    previsões antes de o bot começar a receber atualizações
+    """
+    with cronologia.fase('assinantes'):
+        areas = await asyncio.to_thread(areas_conhecidas)
+    with cronologia.fase('aquecimento'):
+        aquecidas, total = await aquecer_previsoes(areas)
+    logger.info(f"Cache aquecido: {aquecidas}/{total} área(s)")
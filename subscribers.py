@@ -0,0 +1,113 @@
+import asyncio
+from config import logger
+from cache import forecast_cache
+from shared_state import estado_compartilhado
+from workers import deste_worker
+
+class SubscriberRegistry:
+    """
+    Registro dos chats inscritos nos alertas, indexado pela área do cache
+    de previsões. Cada inscrição, remoção ou mudança de área grava apenas
+    o chat no estado compartilhado (SQLite ou Redis). Com vários workers,
+    cada processo carrega só os chats do seu fragmento.
+    """
+    def __init__(self, armazenamento=None):
+        self.armazenamento = armazenamento or estado_compartilhado.assinantes
+        self.area_por_chat = None
+        self.chats_por_area = {}
+        self.coordenadas_area = {}
+
+    def _carregar(self):
+        """Carrega o registro para a memória no primeiro uso"""
+        if self.area_por_chat is not None:
+            return
+        self.area_por_chat = {}
+        try:
+            linhas = self.armazenamento.listar()
+        except Exception as e:
+            logger.error(f"Erro ao carregar assinantes: {e}")
+            return
+        desatualizados = []
+        for chat_id, area, latitude, longitude in linhas:
+            if deste_worker(chat_id):
+                nova_area = self._indexar(chat_id, latitude, longitude)
+                if nova_area != area:
+                    desatualizados.append((chat_id, nova_area, latitude, longitude))
+        # Mantém o índice por área do armazenamento (chats_da_area) após mudanças no modo de chave
+        for chat_id, area, latitude, longitude in desatualizados:
+            self._gravar(chat_id, area, latitude, longitude)
+        logger.info(f"{len(self.area_por_chat)} assinante(s) carregado(s)")
+
+    def _indexar(self, chat_id, latitude, longitude):
+        self._desindexar(chat_id)
+        # A área é recalculada para acompanhar mudanças no modo de chave do cache
+        area = forecast_cache.chave(latitude, longitude)
+        self.area_por_chat[chat_id] = area
+        self.chats_por_area.setdefault(area, set()).add(chat_id)
+        self.coordenadas_area.setdefault(area, (latitude, longitude))
+        return area
+
+    def _desindexar(self, chat_id):
+        area = self.area_por_chat.pop(chat_id, None)
+        if area is None:
+            return
+        chats = self.chats_por_area.get(area)
+        chats.discard(chat_id)
+        if not chats:
+            del self.chats_por_area[area]
+            self.coordenadas_area.pop(area, None)
+
+    def _gravar(self, chat_id, area, latitude, longitude):
+        try:
+            self.armazenamento.gravar(chat_id, area, latitude, longitude)
+        except Exception as e:
+            logger.error(f"Erro ao gravar assinante {chat_id}: {e}")
+
+    def _apagar(self, chat_id):
+        try:
+            self.armazenamento.apagar(chat_id)
+        except Exception as e:
+            logger.error(f"Erro ao remover assinante {chat_id}: {e}")
+
+    def inscrito(self, chat_id):
+        """Indica se o chat recebe alertas"""
+        self._carregar()
+        return chat_id in self.area_por_chat
+
+    async def inscrever(self, chat_id, latitude, longitude):
+        """Inscreve o chat (ou atualiza sua área) nos alertas"""
+        self._carregar()
+        area = self._indexar(chat_id, latitude, longitude)
+        await asyncio.to_thread(self._gravar, chat_id, area, latitude, longitude)
+
+    async def remover(self, chat_id):
+        """Cancela a inscrição do chat"""
+        self._carregar()
+        self._desindexar(chat_id)
+        await asyncio.to_thread(self._apagar, chat_id)
+
+    async def atualizar_local(self, chat_id, latitude, longitude):
+        """Move um chat inscrito para a área das novas coordenadas"""
+        if self.inscrito(chat_id):
+            await self.inscrever(chat_id, latitude, longitude)
+
+    def por_area(self):
+        """
+        Retorna {area: (latitude, longitude, chats)} com todos os inscritos
+        """
+        self._carregar()
+        return {
+            area: (*self.coordenadas_area[area], set(chats))
+            for area, chats in self.chats_por_area.items()
+        }
+
+    def chats_da_area(self, area):
+        """Chats inscritos na área (consulta indexada no estado compartilhado)"""
+        return self.armazenamento.chats_da_area(area)
+
+    def __len__(self):
+        self._carregar()
+        return len(self.area_por_chat)
+
+# Instância global do registro de assinantes
+subscriber_registry = SubscriberRegistry()
@@ -1,11 +1,27 @@
+import asyncio
 import json
 import os
-import requests
-from config import logger
+import sqlite3
+import threading
+from config import logger, SETTINGS_DB, SETTINGS_FLUSH_DELAY
+from geocoding import geocodificar_cep
+
+# Chave usada para a configuração global herdada do user_settings.json
+CHAT_PADRAO = 0
+
+# Campos de localização de cada chat
+CAMPOS_LOCAL = ('cidade', 'estado', 'latitude', 'longitude', 'cep')
 
 class UserConfig:
-    def __init__(self):
+    """
+    Configurações de localização por chat. As leituras passam por um
+    dicionário em memória; as gravações são agrupadas e feitas em SQLite
+    (modo WAL) fora do loop de eventos.
+    """
+    def __init__(self, db_path=SETTINGS_DB, atraso_gravacao=SETTINGS_FLUSH_DELAY):
         self.config_file = 'user_settings.json'
+        self.db_path = db_path
+        self.atraso_gravacao = atraso_gravacao
         self.default_settings = {
             'cidade': 'Natal',
             'estado': 'RN',
@@ -13,70 +29,236 @@ class UserConfig:
             'longitude': -35.24775350308109,
             'cep': '59000-000'
         }
-        self.settings = self.load_settings()
-    
-    def load_settings(self):
-        """Carrega as configurações do arquivo"""
+        self.settings_por_chat = {}
+        self._pendentes = {}
+        self._gravacao_agendada = False
+        self._tarefa_gravacao = None
+        self._lock = threading.Lock()
+        self._conexao = None
+
+    def preparar(self):
+        """
+        Abre o banco, migra o JSON legado e carrega o padrão no primeiro uso
+        (a importação do módulo não faz E/S)
+        """
+        if self._conexao is not None:
+            return
+        self._conexao = self._conectar()
+        self.migrar_json()
+        self.default_settings = self._carregar_chat(CHAT_PADRAO) or self.default_settings
+
+    def _conectar(self):
+        """Abre o banco de configurações"""
+        conexao = sqlite3.connect(self.db_path, check_same_thread=False)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS chats (
+                chat_id INTEGER PRIMARY KEY,
+                cidade TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                cep TEXT NOT NULL
+            )
+        """)
+        conexao.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT)")
+        conexao.commit()
+        return conexao
+
+    def migrar_json(self):
+        """Importa o user_settings.json legado como configuração padrão (uma única vez)"""
+        with self._lock:
+            migrado = self._conexao.execute(
+                "SELECT valor FROM meta WHERE chave = 'json_migrado'"
+            ).fetchone()
+        if migrado or not os.path.exists(self.config_file):
+            return
+
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                settings = {**self.default_settings, **json.load(f)}
+            with self._lock:
+                self._gravar(CHAT_PADRAO, settings)
+                self._conexao.execute("INSERT OR REPLACE INTO meta VALUES ('json_migrado', '1')")
+                self._conexao.commit()
+            logger.info(f"Configurações migradas de {self.config_file}")
+        except Exception as e:
+            logger.error(f"Erro ao migrar configurações: {e}")
+
+    def _gravar(self, chat_id, settings):
+        self._conexao.execute(
+            "INSERT OR REPLACE INTO chats VALUES (?, ?, ?, ?, ?, ?)",
+            (chat_id, settings['cidade'], settings['estado'], settings['latitude'],
+             settings['longitude'], settings['cep'])
+        )
+
+    def _carregar_chat(self, chat_id):
+        """Lê as configurações de um chat do banco, ou None"""
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return self.default_settings
+            with self._lock:
+                linha = self._conexao.execute(
+                    "SELECT cidade, estado, latitude, longitude, cep FROM chats WHERE chat_id = ?",
+                    (chat_id,)
+                ).fetchone()
         except Exception as e:
             logger.error(f"Erro ao carregar configurações: {e}")
-            return self.default_settings
-    
-    def save_settings(self):
-        """Salva as configurações no arquivo"""
+            return None
+        if linha is None:
+            return None
+        return dict(zip(CAMPOS_LOCAL, linha))
+
+    def load_settings(self, chat_id=CHAT_PADRAO):
+        """Retorna as configurações do chat (memória, depois banco, depois padrão)"""
+        settings = self.settings_por_chat.get(chat_id)
+        if settings is None:
+            self.preparar()
+            settings = self._carregar_chat(chat_id) or dict(self.default_settings)
+            self.settings_por_chat[chat_id] = settings
+        return settings
+
+    def save_settings(self, chat_id=CHAT_PADRAO):
+        """Marca as configurações do chat para gravação agrupada"""
+        self._pendentes[chat_id] = dict(self.load_settings(chat_id))
+        self._agendar_gravacao()
+        return True
+
+    def _agendar_gravacao(self):
+        """Agenda a gravação das pendências após o atraso configurado"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, indent=4, ensure_ascii=False)
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fora do loop de eventos: grava imediatamente
+            self.gravar_pendentes()
+            return
+
+        if self._gravacao_agendada:
+            return
+        self._gravacao_agendada = True
+        loop.call_later(self.atraso_gravacao, self._iniciar_gravacao, loop)
+
+    def _iniciar_gravacao(self, loop):
+        # As pendências são trocadas no loop de eventos; a thread grava apenas a cópia
+        pendentes, self._pendentes = self._pendentes, {}
+        if not pendentes:
+            self._gravacao_agendada = False
+            return
+        self._tarefa_gravacao = loop.create_task(asyncio.to_thread(self._gravar_lote, pendentes, loop))
+        self._tarefa_gravacao.add_done_callback(self._gravacao_concluida)
+
+    def _gravacao_concluida(self, tarefa):
+        # Só uma gravação por vez: a próxima é agendada ao final da atual
+        self._gravacao_agendada = False
+        if self._pendentes:
+            self._agendar_gravacao()
+
+    def _repor_pendentes(self, pendentes):
+        """Devolve gravações que falharam às pendências (sem sobrescrever as mais novas)"""
+        self._pendentes = {**pendentes, **self._pendentes}
+
+    def _gravar_lote(self, pendentes, loop=None):
+        """
+        Grava em uma única transação as configurações `pendentes`. Em caso de
+        erro, elas voltam às pendências (pelo loop de eventos, se informado)
+        """
+        if not pendentes:
+            return True
+        try:
+            self.preparar()
+            with self._lock:
+                for chat_id, settings in pendentes.items():
+                    self._gravar(chat_id, settings)
+                self._conexao.commit()
             return True
         except Exception as e:
             logger.error(f"Erro ao salvar configurações: {e}")
+            # Mantém as pendências para a próxima tentativa
+            if loop is not None:
+                loop.call_soon_threadsafe(self._repor_pendentes, pendentes)
+            else:
+                self._repor_pendentes(pendentes)
             return False
-    
-    def update_location(self, cep):
-        """Atualiza localização baseado no CEP"""
+
+    def gravar_pendentes(self):
+        """Grava as configurações alteradas (uso fora do loop de eventos)"""
+        pendentes, self._pendentes = self._pendentes, {}
+        return self._gravar_lote(pendentes)
+
+    async def finalizar_gravacao(self):
+        """Aguarda a gravação em andamento e grava as pendências restantes (desligamento)"""
+        if self._tarefa_gravacao is not None:
+            await asyncio.gather(self._tarefa_gravacao, return_exceptions=True)
+        pendentes, self._pendentes = self._pendentes, {}
+        return await asyncio.to_thread(self._gravar_lote, pendentes, asyncio.get_running_loop())
+
+    async def update_location(self, cep, chat_id=CHAT_PADRAO):
+        """Atualiza localização do chat baseado no CEP"""
         try:
-            # Busca informações do CEP usando a API ViaCEP
-            response = requests.get(f"https://viacep.com.br/ws/{cep}/json/")
-            if response.status_code == 200:
-                data = response.json()
-                if 'erro' not in data:
-                    # Atualiza cidade e estado
-                    self.settings['cidade'] = data['localidade']
-                    self.settings['estado'] = data['uf']
-                    self.settings['cep'] = cep
-                    
-                    # Busca coordenadas usando Nominatim (OpenStreetMap)
-                    geocode_url = f"https://nominatim.openstreetmap.org/search?city={data['localidade']}&state={data['uf']}&country=Brazil&format=json"
-                    headers = {'User-Agent': 'WeatherBot/1.0'}
-                    
-                    geo_response = requests.get(geocode_url, headers=headers)
-                    if geo_response.status_code == 200:
-                        geo_data = geo_response.json()
-                        if geo_data:
-                            self.settings['latitude'] = float(geo_data[0]['lat'])
-                            self.settings['longitude'] = float(geo_data[0]['lon'])
-                    
-                    self.save_settings()
-                    return True, "Localização atualizada com sucesso!"
-                return False, "CEP não encontrado"
-            return False, "Erro ao buscar CEP"
+            resultado, erro = await geocodificar_cep(cep)
+            if erro:
+                return False, erro
+
+            settings = dict(self.load_settings(chat_id))
+            settings['cidade'] = resultado['cidade']
+            settings['estado'] = resultado['estado']
+            settings['cep'] = cep
+            if resultado['latitude'] is not None:
+                settings['latitude'] = resultado['latitude']
+                settings['longitude'] = resultado['longitude']
+
+            self.settings_por_chat[chat_id] = settings
+            self.save_settings(chat_id)
+            return True, "Localização atualizada com sucesso!"
         except Exception as e:
             logger.error(f"Erro ao atualizar localização: {e}")
             return False, f"Erro ao atualizar localização: {str(e)}"
     
-    def get_location(self):
-        """Retorna as informações de localização atual"""
+    def locais(self, chat_ids):
+        """
+        Localização de vários chats, com uma consulta ao banco para os que
+        não estão em memória. Não altera o cache em memória: pode ser
+        chamado fora do loop de eventos
+        """
+        self.preparar()
+        resultado = {}
+        faltando = []
+        for chat_id in chat_ids:
+            settings = self.settings_por_chat.get(chat_id)
+            if settings is None:
+                faltando.append(chat_id)
+            else:
+                resultado[chat_id] = {campo: settings[campo] for campo in CAMPOS_LOCAL}
+
+        # Em blocos, abaixo do limite de parâmetros do SQLite
+        for inicio in range(0, len(faltando), 500):
+            bloco = faltando[inicio:inicio + 500]
+            try:
+                with self._lock:
+                    linhas = self._conexao.execute(
+                        f"SELECT chat_id, cidade, estado, latitude, longitude, cep FROM chats "
+                        f"WHERE chat_id IN ({','.join('?' * len(bloco))})",
+                        bloco
+                    ).fetchall()
+            except Exception as e:
+                logger.error(f"Erro ao carregar configurações: {e}")
+                linhas = []
+            for chat_id, *valores in linhas:
+                resultado[chat_id] = dict(zip(CAMPOS_LOCAL, valores))
+
+        padrao = {campo: self.default_settings[campo] for campo in CAMPOS_LOCAL}
+        for chat_id in faltando:
+            resultado.setdefault(chat_id, dict(padrao))
+        return resultado
+
+    def get_location(self, chat_id=CHAT_PADRAO):
+        """Retorna as informações de localização do chat"""
+        settings = self.load_settings(chat_id)
         return {
-            'cidade': self.settings['cidade'],
-            'estado': self.settings['estado'],
-            'latitude': self.settings['latitude'],
-            'longitude': self.settings['longitude'],
-            'cep': self.settings['cep']
+            'cidade': settings['cidade'],
+            'estado': settings['estado'],
+            'latitude': settings['latitude'],
+            'longitude': settings['longitude'],
+            'cep': settings['cep']
         }
 
 # Instância global para configurações do usuário
-user_config = UserConfig() 
\ No newline at end of file
+user_config = UserConfig()
@@ -1,5 +1,18 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextvars import ContextVar
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
-from config import logger
+from telegram.error import BadRequest
+from config import logger, CALLBACK_DEBOUNCE, MESSAGE_HASH_MAX
+from metrics import chamadas_evitadas
+
+# (chat_id, message_id) -> hash do conteúdo exibido, para omitir edições iguais
+_conteudo_mensagens = OrderedDict()
+
+# Função chamada com cada resposta enviada pelo handler em execução
+# (definida pelo controle de admissão para guardar a última resposta)
+resposta_em_curso = ContextVar('resposta_em_curso', default=None)
 
 def criar_menu_voltar():
     """
@@ -8,43 +21,112 @@ def criar_menu_voltar():
     keyboard = [[InlineKeyboardButton("⬅️ Voltar ao Menu", callback_data='voltar_menu')]]
     return InlineKeyboardMarkup(keyboard)
 
+def _hash_conteudo(mensagem, reply_markup):
+    """Hash do texto e dos botões de uma mensagem"""
+    conteudo = mensagem + (reply_markup.to_json() if reply_markup is not None else '')
+    return hashlib.blake2b(conteudo.encode(), digest_size=8).hexdigest()
+
+def _registrar_conteudo(message, hash_conteudo):
+    """Guarda o hash do conteúdo exibido na mensagem (LRU limitado)"""
+    if message is None or not hasattr(message, 'message_id'):
+        return
+    chave = (message.chat_id, message.message_id)
+    _conteudo_mensagens[chave] = hash_conteudo
+    _conteudo_mensagens.move_to_end(chave)
+    while len(_conteudo_mensagens) > MESSAGE_HASH_MAX:
+        _conteudo_mensagens.popitem(last=False)
+
 async def enviar_resposta(update_obj, mensagem, reply_markup=None):
     """
-    Função auxiliar para enviar resposta seja de comando ou callback
+    Função auxiliar para enviar resposta seja de comando ou callback.
+    Edições que não mudariam a mensagem são omitidas
     """
+    hash_conteudo = _hash_conteudo(mensagem, reply_markup)
+    registrar = resposta_em_curso.get()
+    if registrar is not None:
+        registrar(mensagem, reply_markup)
     try:
         if hasattr(update_obj, 'callback_query') and update_obj.callback_query:
             # É um callback de botão
-            await update_obj.callback_query.message.edit_text(
+            message = update_obj.callback_query.message
+            if _conteudo_mensagens.get((message.chat_id, message.message_id)) == hash_conteudo:
+                chamadas_evitadas.inc('edicao_igual')
+                return
+            await message.edit_text(
                 text=mensagem,
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
+            _registrar_conteudo(message, hash_conteudo)
         else:
             # É um comando direto
-            await update_obj.message.reply_text(
+            enviada = await update_obj.message.reply_text(
                 text=mensagem,
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
+            _registrar_conteudo(enviada, hash_conteudo)
+    except BadRequest as e:
+        if getattr(update_obj, 'callback_query', None) and 'not modified' in str(e).lower():
+            # Conteúdo já exibido (ex.: mensagem anterior ao reinício do bot)
+            _registrar_conteudo(update_obj.callback_query.message, hash_conteudo)
+            chamadas_evitadas.inc('edicao_igual')
+            return
+        await _enviar_nova(update_obj, mensagem, reply_markup, hash_conteudo, e)
     except Exception as e:
-        logger.error(f"Erro ao enviar resposta: {e}")
+        await _enviar_nova(update_obj, mensagem, reply_markup, hash_conteudo, e)
+
+async def _enviar_nova(update_obj, mensagem, reply_markup, hash_conteudo, erro):
+    logger.error(f"Erro ao enviar resposta: {erro}")
+    try:
+        # Tenta enviar uma nova mensagem como fallback
+        if hasattr(update_obj, 'callback_query') and update_obj.callback_query:
+            enviada = await update_obj.callback_query.message.reply_text(
+                text=mensagem,
+                reply_markup=reply_markup,
+                parse_mode='Markdown'
+            )
+        else:
+            enviada = await update_obj.message.reply_text(
+                text=mensagem,
+                reply_markup=reply_markup,
+                parse_mode='Markdown'
+            )
+        _registrar_conteudo(enviada, hash_conteudo)
+    except Exception as e2:
+        logger.error(f"Erro no fallback: {e2}")
+
+class DebounceChat:
+    """
+    Agrupa rajadas de cliques de um mesmo chat: o primeiro clique é executado
+    na hora; os que chegam enquanto ele roda são agrupados e só o mais novo
+    é executado quando o atual terminar
+    """
+    def __init__(self, ativo=CALLBACK_DEBOUNCE):
+        self.ativo = ativo
+        self._em_execucao = set()
+        self._pendente = {}  # chat_id -> clique mais novo aguardando
+
+    async def executar(self, chat_id, clique):
+        """Executa `clique` (função assíncrona sem argumentos) ou o agrupa ao clique em execução"""
+        if not self.ativo:
+            await clique()
+            return
+        if chat_id in self._em_execucao:
+            if chat_id in self._pendente:
+                chamadas_evitadas.inc('clique_agrupado')
+            self._pendente[chat_id] = clique
+            return
+
+        self._em_execucao.add(chat_id)
         try:
-            # Tenta enviar uma nova mensagem como fallback
-            if hasattr(update_obj, 'callback_query') and update_obj.callback_query:
-                await update_obj.callback_query.message.reply_text(
-                    text=mensagem,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-            else:
-                await update_obj.message.reply_text(
-                    text=mensagem,
-                    reply_markup=reply_markup,
-                    parse_mode='Markdown'
-                )
-        except Exception as e2:
-            logger.error(f"Erro no fallback: {e2}")
+            while clique is not None:
+                await clique()
+                clique = self._pendente.pop(chat_id, None)
+        finally:
+            self._em_execucao.discard(chat_id)
+            if self._pendente.pop(chat_id, None) is not None:
+                chamadas_evitadas.inc('clique_agrupado')
 
 def criar_menu_principal():
     """Cria o menu principal"""
@@ -59,4 +141,7 @@ def criar_menu_principal():
          InlineKeyboardButton("🔔 Alertas", callback_data='alertas_config')],
         [InlineKeyboardButton("❓ Ajuda", callback_data='help')]
     ]
-    return InlineKeyboardMarkup(keyboard) 
\ No newline at end of file
+    return InlineKeyboardMarkup(keyboard) 
+
+# Instância global usada pelo handler de botões
+debounce_chat = DebounceChat()
@@ -1,43 +1,230 @@
-import requests
-from datetime import datetime, timedelta
-from config import weather_cache, logger
-import os
+import asyncio
+import time
+import httpx
+from datetime import datetime
+from config import logger, UPDATE_INTERVAL, BULK_FALLBACK_CONCURRENCY, WORKERS
+from cache import forecast_cache
+from shared_state import estado_compartilhado
+from forecast_model import processar_previsao, perfil_atende, PERFIL_COMPLETO
+from http_client import obter_cliente_sync
+from providers import buscar_previsao, buscar_previsoes_em_lote, provedores_ativos
 
-def obter_previsao_tempo(latitude, longitude):
+# Payloads compartilhados entre os processos (SQLite ou Redis; None se desativado)
+cache_compartilhado = estado_compartilhado.previsoes
+
+# Requisições à API em andamento, por área: (tarefa, perfil)
+_requisicoes_em_andamento = {}
+
+def _atende(perfil):
+    """Filtro do cache: previsões buscadas com um perfil igual ou maior"""
+    return lambda previsao: perfil_atende(previsao.perfil, perfil)
+
+def _buscar_cache(chave, perfil=PERFIL_COMPLETO):
+    """
+    Retorna os dados em cache válidos para a área e o perfil, se houver
+    """
+    data = forecast_cache.obter(chave, _atende(perfil))
+    if data is None and cache_compartilhado is not None:
+        data, fresco = _restaurar_compartilhado(chave, cache_compartilhado.carregar(chave))
+        if not fresco or not perfil_atende(data.perfil, perfil):
+            data = None
+    if data is not None:
+        logger.info(f"Usando dados do cache ({chave})")
+    return data
+
+def _restaurar_compartilhado(chave, registro):
+    """
+    Recoloca no cache em memória um registro lido do cache compartilhado.
+    Retorna (dados, fresco) como ForecastCache.consultar
+    """
+    if registro is None:
+        return None, False
+
+    payload, timestamp, latitude, longitude, perfil = registro
+    timestamp = datetime.fromtimestamp(timestamp)
+    previsao = _armazenar(chave, payload, latitude, longitude, perfil, timestamp)
+    logger.info(f"Previsão restaurada do cache compartilhado ({chave})")
+    return previsao, datetime.now() - timestamp < forecast_cache.duracao
+
+def _mais_recente(chave, registro):
+    """Indica se o registro compartilhado é mais novo que a entrada em memória da área"""
+    if registro is None:
+        return False
+    entrada = forecast_cache.entradas.get(chave)
+    return entrada is None or datetime.fromtimestamp(registro[1]) > entrada['timestamp']
+
+def _armazenar(chave, payload, latitude, longitude, perfil, timestamp=None):
+    """
+    Processa o payload no modelo colunar e o guarda no cache da área
+    """
+    previsao = processar_previsao(payload, perfil)
+    forecast_cache.definir(chave, previsao, latitude, longitude, timestamp=timestamp)
+    return previsao
+
+async def _buscar_api_async(chave, latitude, longitude, perfil):
+    """
+    Busca a previsão nos provedores (com hedge e failover) e atualiza o cache da área
+    """
+    try:
+        payload = await buscar_previsao(latitude, longitude, perfil)
+        if payload is None:
+            return None
+        existente = forecast_cache.espiar(chave)
+        if existente is not None and not perfil_atende(perfil, existente.perfil):
+            # Uma busca mais completa terminou antes: não reduz o conteúdo do cache
+            return existente
+        logger.info(f"Dados de previsão atualizados com sucesso ({perfil})")
+        previsao = _armazenar(chave, payload, latitude, longitude, perfil)
+        if cache_compartilhado is not None:
+            await asyncio.to_thread(cache_compartilhado.salvar, chave, payload, latitude, longitude, time.time(), perfil)
+        return previsao
+
+    except Exception as e:
+        logger.error(f"Erro inesperado ao obter previsão: {e}")
+        return None
+
+def _requisicao_compartilhada(chave, latitude, longitude, perfil):
+    """
+    Retorna a requisição em andamento para a área (se o perfil dela atender
+    ao pedido), criando uma se necessário, para que falhas de cache
+    simultâneas façam uma única chamada à API
+    """
+    andamento = _requisicoes_em_andamento.get(chave)
+    if andamento is not None and perfil_atende(andamento[1], perfil):
+        logger.info(f"Aguardando requisição em andamento ({chave})")
+        return andamento[0]
+
+    tarefa = asyncio.ensure_future(_buscar_api_async(chave, latitude, longitude, perfil))
+    _requisicoes_em_andamento[chave] = (tarefa, perfil)
+
+    def _finalizar(t):
+        andamento = _requisicoes_em_andamento.get(chave)
+        if andamento is not None and andamento[0] is t:
+            del _requisicoes_em_andamento[chave]
+
+    tarefa.add_done_callback(_finalizar)
+    return tarefa
+
+async def obter_previsao_tempo_async(latitude, longitude, perfil=PERFIL_COMPLETO):
+    """
+    Obtém a previsão do tempo sem bloquear o loop de eventos,
+    usando o pool de conexões compartilhado. `perfil` é o conteúdo mínimo
+    de que a tela precisa; uma previsão maior em cache também o atende
+    """
+    chave = forecast_cache.chave(latitude, longitude)
+    data, fresco = forecast_cache.consultar(chave, _atende(perfil))
+    # Com vários workers, outro processo pode ter atualizado a área: dados
+    # vencidos em memória também consultam o cache compartilhado
+    if (not fresco and cache_compartilhado is not None
+            and (WORKERS > 1 or chave not in forecast_cache.entradas)):
+        registro = await asyncio.to_thread(cache_compartilhado.carregar, chave)
+        if _mais_recente(chave, registro):
+            restaurada, restaurada_fresca = _restaurar_compartilhado(chave, registro)
+            if perfil_atende(restaurada.perfil, perfil):
+                data, fresco = restaurada, restaurada_fresca
+    if data is not None:
+        if fresco:
+            logger.info(f"Usando dados do cache ({chave})")
+        else:
+            # Serve os dados vencidos imediatamente e atualiza em segundo plano, mantendo o perfil
+            logger.info(f"Usando dados vencidos do cache ({chave}), atualizando em segundo plano")
+            _requisicao_compartilhada(chave, latitude, longitude, data.perfil)
+        return data
+
+    # shield: o cancelamento de um chamador não interrompe os demais
+    return await asyncio.shield(_requisicao_compartilhada(chave, latitude, longitude, perfil))
+
+async def buscar_em_lote(locais, perfil=PERFIL_COMPLETO, forcar=False):
+    """
+    Coloca no cache as previsões de vários locais {chave: (latitude, longitude)}:
+    em requisições em lote quando o provedor principal aceita, senão (e para
+    os que falharem no lote) em buscas individuais com paralelismo limitado.
+    Sem `forcar`, locais já em cache com o perfil são ignorados.
+    Retorna o número de locais atualizados
+    """
+    if not forcar:
+        locais = {
+            chave: coordenadas for chave, coordenadas in locais.items()
+            if (existente := forecast_cache.espiar(chave)) is None or not perfil_atende(existente.perfil, perfil)
+        }
+    if not locais:
+        return 0
+
+    chaves = list(locais)
+    atualizados = 0
+    restantes = chaves
+    payloads = await buscar_previsoes_em_lote([locais[chave] for chave in chaves], perfil)
+    if payloads is not None:
+        restantes = []
+        gravar = []
+        for chave, payload in zip(chaves, payloads):
+            if payload is None:
+                restantes.append(chave)
+                continue
+            latitude, longitude = locais[chave]
+            _armazenar(chave, payload, latitude, longitude, perfil)
+            gravar.append((chave, payload, latitude, longitude))
+            atualizados += 1
+        if cache_compartilhado is not None and gravar:
+            await asyncio.to_thread(cache_compartilhado.salvar_lote, gravar, time.time(), perfil)
+
+    if restantes:
+        semaforo = asyncio.Semaphore(BULK_FALLBACK_CONCURRENCY)
+
+        async def buscar(chave):
+            async with semaforo:
+                latitude, longitude = locais[chave]
+                return await _requisicao_compartilhada(chave, latitude, longitude, perfil) is not None
+
+        resultados = await asyncio.gather(*[buscar(chave) for chave in restantes])
+        atualizados += sum(resultados)
+    return atualizados
+
+async def atualizar_locais_ativos(context=None):
+    """
+    Job periódico: atualiza os locais consultados recentemente antes que
+    seus dados expirem, para que os usuários não esperem pela API
+    """
+    pendentes = forecast_cache.chaves_para_atualizar(UPDATE_INTERVAL)
+    if not pendentes:
+        return
+
+    logger.info(f"Atualizando {len(pendentes)} local(is) em segundo plano")
+    por_perfil = {}
+    for chave, latitude, longitude, previsao in pendentes:
+        por_perfil.setdefault(previsao.perfil, {})[chave] = (latitude, longitude)
+    for perfil, locais in por_perfil.items():
+        await buscar_em_lote(locais, perfil, forcar=True)
+
+def obter_previsao_tempo(latitude, longitude, perfil=PERFIL_COMPLETO):
     """
     Obtém a previsão do tempo com cache para evitar muitas requisições
+    (versão síncrona mantida para chamadores legados)
     """
     try:
-        # Verifica se há dados em cache válidos
-        if (weather_cache['data'] and weather_cache['timestamp'] and 
-            datetime.now() - weather_cache['timestamp'] < timedelta(minutes=weather_cache['cache_duration'])):
-            logger.info("Usando dados do cache")
-            return weather_cache['data']
-        
-        api_key = os.getenv("WEATHERAPI_KEY")
-        if not api_key:
-            logger.error("Chave da API do WeatherAPI não configurada")
+        chave = forecast_cache.chave(latitude, longitude)
+        data = _buscar_cache(chave, perfil)
+        if data is not None:
+            return data
+
+        # Sem hedge: usa o primeiro provedor disponível
+        provedor = next((p for p in provedores_ativos if p.disponivel()), None)
+        if provedor is None:
+            logger.error("Nenhum provedor de previsão configurado")
             return None
-        
-        url = f"http://api.weatherapi.com/v1/forecast.json?key={api_key}&q={latitude},{longitude}&days=7&aqi=yes&alerts=yes"
-        
-        logger.info(f"Fazendo requisição para API do tempo: {url}")
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            logger.error(f"Erro na API: {response.status_code} - {response.text}")
+
+        url, params = provedor.montar_requisicao(latitude, longitude, perfil)
+        logger.info(f"Fazendo requisição para API do tempo ({provedor.nome}): {url}")
+        response = obter_cliente_sync().get(url, params=params)
+        payload = provedor.processar(response)
+        if payload is None:
             return None
-        
-        data = response.json()
-        
-        # Atualiza o cache
-        weather_cache['data'] = data
-        weather_cache['timestamp'] = datetime.now()
-        
-        logger.info("Dados de previsão atualizados com sucesso")
-        return data
-        
-    except requests.exceptions.RequestException as e:
+        previsao = _armazenar(chave, payload, latitude, longitude, perfil)
+        if cache_compartilhado is not None:
+            cache_compartilhado.salvar(chave, payload, latitude, longitude, time.time(), perfil)
+        return previsao
+
+    except httpx.HTTPError as e:
         logger.error(f"Erro de conexão com a API: {e}")
         return None
     except Exception as e:
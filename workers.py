@@ -0,0 +1,237 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+from telegram import Bot, Update
+from config import (logger, WORKERS, WORKER_INDEX, WORKER_QUEUE_MAX, WEBHOOK_URL, WEBHOOK_LISTEN,
+                    WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, TELEGRAM_API_URL,
+                    WEBHOOK_MAX_BODY, WEBHOOK_READ_TIMEOUT)
+
+def fragmento(chat_id, total=WORKERS):
+    """Índice do worker responsável pelo chat"""
+    return chat_id % total
+
+def deste_worker(chat_id):
+    """Indica se o chat é atendido por este processo"""
+    return WORKERS <= 1 or fragmento(chat_id) == WORKER_INDEX
+
+def chat_da_atualizacao(dados):
+    """
+    chat_id de uma atualização bruta do Telegram (mensagem, botão, membro...),
+    ou o id do usuário quando não há chat; 0 se não houver nenhum
+    """
+    for valor in dados.values():
+        if not isinstance(valor, dict):
+            continue
+        # Botões trazem o chat na mensagem original
+        mensagem = valor.get('message', valor)
+        chat = mensagem.get('chat') if isinstance(mensagem, dict) else None
+        if chat:
+            return chat['id']
+        if 'from' in valor:
+            return valor['from']['id']
+    return 0
+
+def _executar_worker(indice, fila, telegram_token):
+    """
+    Processo worker: executa a aplicação do bot sem updater, atendendo as
+    atualizações do seu fragmento recebidas do supervisor pela fila
+    """
+    # Ctrl+C chega a todo o grupo de processos: o supervisor encerra os workers pela fila
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from bot import criar_aplicacao
+    app = criar_aplicacao(telegram_token, com_updater=False)
+    asyncio.run(_servir_fila(app, fila))
+
+async def _servir_fila(app, fila):
+    """Ciclo de vida da aplicação no worker (equivalente ao run_webhook)"""
+    from shared_state import estado_compartilhado
+    supervisor = multiprocessing.parent_process()
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    logger.info(f"Worker {WORKER_INDEX} pronto")
+    try:
+        while True:
+            try:
+                dados = await asyncio.to_thread(fila.get, True, 1.0)
+            except queue.Empty:
+                if supervisor is not None and not supervisor.is_alive():
+                    logger.warning(f"Supervisor encerrado: finalizando o worker {WORKER_INDEX}")
+                    break
+                continue
+            if dados is None:
+                break
+            await app.update_queue.put(Update.de_json(dados, app.bot))
+    finally:
+        await app.stop()
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        estado_compartilhado.fechar()
+        logger.info(f"Worker {WORKER_INDEX} finalizado")
+
+class Supervisor:
+    """
+    Recebe o webhook do Telegram e distribui cada atualização ao worker
+    do seu chat (chat_id % WORKERS), de modo que todas as atualizações de
+    um chat sejam tratadas pelo mesmo processo. Workers que terminarem
+    inesperadamente são reiniciados
+    """
+    def __init__(self, telegram_token, total=WORKERS, fila_max=WORKER_QUEUE_MAX):
+        self.telegram_token = telegram_token
+        self.total = total
+        self.contexto = multiprocessing.get_context('spawn')
+        self.filas = [self.contexto.Queue(fila_max) for _ in range(total)]
+        self.processos = [None] * total
+        self.secret = WEBHOOK_SECRET
+        self._parando = asyncio.Event()
+
+    def _iniciar_worker(self, indice):
+        # Lido pelo config.py do novo processo (spawn)
+        os.environ['WORKER_INDEX'] = str(indice)
+        processo = self.contexto.Process(
+            target=_executar_worker,
+            args=(indice, self.filas[indice], self.telegram_token),
+            name=f"worker-{indice}"
+        )
+        processo.start()
+        self.processos[indice] = processo
+        logger.info(f"Worker {indice} iniciado (pid {processo.pid})")
+
+    def rotear(self, corpo):
+        """Coloca a atualização na fila do worker do chat; retorna o status HTTP"""
+        try:
+            dados = json.loads(corpo)
+        except ValueError:
+            return '400 Bad Request'
+        indice = fragmento(chat_da_atualizacao(dados), self.total)
+        try:
+            self.filas[indice].put_nowait(dados)
+        except queue.Full:
+            # O Telegram reenvia as atualizações recusadas
+            logger.warning(f"Fila do worker {indice} cheia: atualização recusada")
+            return '503 Service Unavailable'
+        return '200 OK'
+
+    async def _atender(self, reader, writer):
+        """
+        Servidor HTTP mínimo do webhook (conexões persistentes). Caminho e
+        segredo são conferidos antes de ler o corpo, que tem tamanho limitado
+        """
+        try:
+            while True:
+                requisicao = await asyncio.wait_for(reader.readline(), timeout=WEBHOOK_READ_TIMEOUT)
+                if not requisicao:
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await asyncio.wait_for(reader.readline(), timeout=WEBHOOK_READ_TIMEOUT)
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    if len(cabecalhos) >= 100:
+                        # Cabeçalhos demais: encerra a conexão sem continuar lendo
+                        return
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                partes = requisicao.decode('latin-1').split()
+                try:
+                    tamanho = int(cabecalhos.get('content-length', 0))
+                except ValueError:
+                    tamanho = -1
+                corpo = None
+                if len(partes) < 2 or partes[0] != 'POST' or partes[1] != f"/{WEBHOOK_PATH}":
+                    status = '404 Not Found'
+                elif not secrets.compare_digest(cabecalhos.get('x-telegram-bot-api-secret-token', ''), self.secret):
+                    status = '403 Forbidden'
+                elif tamanho < 0:
+                    status = '400 Bad Request'
+                elif tamanho > WEBHOOK_MAX_BODY:
+                    status = '413 Payload Too Large'
+                else:
+                    corpo = await asyncio.wait_for(reader.readexactly(tamanho), timeout=WEBHOOK_READ_TIMEOUT)
+                    status = self.rotear(corpo)
+                # Sem ler o corpo recusado, a conexão não pode ser reaproveitada
+                fechar = corpo is None or cabecalhos.get('connection', '').lower() == 'close'
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n"
+                    f"Connection: {'close' if fechar else 'keep-alive'}\r\n\r\n".encode()
+                )
+                await writer.drain()
+                if fechar:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Erro no webhook do supervisor: {e}")
+        finally:
+            writer.close()
+
+    async def _registrar_webhook(self):
+        """Aponta o webhook do Telegram para o supervisor"""
+        opcoes = {}
+        if TELEGRAM_API_URL:
+            opcoes = {
+                'base_url': f"{TELEGRAM_API_URL.rstrip('/')}/bot",
+                'base_file_url': f"{TELEGRAM_API_URL.rstrip('/')}/file/bot"
+            }
+        async with Bot(self.telegram_token, **opcoes) as bot:
+            await bot.set_webhook(
+                url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=self.secret,
+                max_connections=WEBHOOK_MAX_CONNECTIONS
+            )
+
+    async def _vigiar_workers(self):
+        """Reinicia os workers que terminarem sem o supervisor pedir"""
+        while not self._parando.is_set():
+            for indice, processo in enumerate(self.processos):
+                if not processo.is_alive():
+                    logger.error(f"Worker {indice} terminou (código {processo.exitcode}): reiniciando")
+                    self._iniciar_worker(indice)
+            try:
+                await asyncio.wait_for(self._parando.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _parar_workers(self):
+        for fila in self.filas:
+            fila.put(None)
+        for indice, processo in enumerate(self.processos):
+            if processo is None:
+                continue
+            await asyncio.to_thread(processo.join, 30)
+            if processo.is_alive():
+                logger.warning(f"Worker {indice} não finalizou a tempo: encerrando")
+                processo.terminate()
+
+    async def executar(self):
+        """Inicia os workers e o webhook e aguarda até o desligamento"""
+        if not self.secret:
+            self.secret = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET não configurado: usando um segredo aleatório")
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._parando.set)
+
+        for indice in range(self.total):
+            self._iniciar_worker(indice)
+        servidor = await asyncio.start_server(self._atender, WEBHOOK_LISTEN, WEBHOOK_PORT)
+        try:
+            await self._registrar_webhook()
+            logger.info(
+                f"Supervisor escutando em {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH} "
+                f"com {self.total} worker(s)"
+            )
+            await self._vigiar_workers()
+        finally:
+            self._parando.set()
+            servidor.close()
+            await self._parar_workers()
+
+def executar_multiprocesso(telegram_token):
+    """Modo multiprocesso: supervisor do webhook mais WORKERS processos"""
+    asyncio.run(Supervisor(telegram_token).executar())